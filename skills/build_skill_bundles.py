@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Precompile skills into content-hashed bundles plus a per-task manifest
+
+Each skill's SKILL.md, agents/openai.yaml and references/*.md (the files the
+backend loader reads) are split into sections at markdown headings, with a
+size and token estimate per section. `manifest.json` maps each task (swipe
+analysis, review generation, ...) to the sections worth attaching, so callers
+can stop pasting every reference into every prompt.
+
+Output goes to skills/.bundles/, which the backend loader skips. Rebuilds are
+incremental: unchanged files are not re-read and unchanged skills keep their
+bundle.
+
+Usage:
+    python3 skills/build_skill_bundles.py
+    python3 skills/build_skill_bundles.py --force
+    python3 skills/build_skill_bundles.py --check   # exit 1 if bundles are stale or a
+                                                    # task pattern matches no section
+"""
+
+import argparse
+import fnmatch
+import hashlib
+import json
+import re
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+SKILLS_ROOT = Path(__file__).resolve().parent
+DEFAULT_OUT = SKILLS_ROOT / ".bundles"
+CHARS_PER_TOKEN = 4
+SPLIT_LEVEL = 3  # Split at #, ## and ### headings.
+
+# Sections attached per task, matched against "<skill>/<file>#<section>".
+# Sections are taken in pattern order until the token budget runs out.
+TASKS: Dict[str, Dict[str, Any]] = {
+    "swipe-analysis": {
+        "description": "Infer a taste profile from liked/disliked movies.",
+        "include": [
+            "movie-taste-profiler/SKILL.md#*",
+            "movie-taste-profiler/references/taste-axes.md#*",
+            "movie-taste-binary-quiz/SKILL.md#3-convert-answers-into-a-profile",
+            "movie-taste-binary-quiz/SKILL.md#4-build-a-handoff-packet-for-the-next-skill",
+            "movie-taste-binary-quiz/references/question-bank.md#turning-answers-into-axes*",
+        ],
+        "exclude": ["*#script-*"],
+        "max_tokens": 6000,
+    },
+    "review-generation": {
+        "description": "Write a personalized review for one title.",
+        "include": [
+            "movie-taste-profiler/SKILL.md#movie-taste-profiler",
+            "movie-taste-profiler/SKILL.md#4-synthesize-the-persona*",
+            "movie-taste-profiler/SKILL.md#5-publish-preferences*",
+            "movie-taste-profiler/references/taste-axes.md#*",
+        ],
+        "exclude": ["*#script-*"],
+        "max_tokens": 3000,
+    },
+    "quiz": {
+        "description": "Run and score the binary taste quiz.",
+        "include": [
+            "movie-taste-binary-quiz/SKILL.md#*",
+            "movie-taste-binary-quiz/references/question-bank.md#*",
+        ],
+        "exclude": ["*#script-*"],
+        "max_tokens": 5000,
+    },
+}
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+_FENCE = re.compile(r"^\s*(```|~~~)")
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _slug(title: str) -> str:
+    slug = re.sub(r"[^\w\s-]", "", title.lower())
+    return re.sub(r"[\s_-]+", "-", slug).strip("-") or "section"
+
+
+def _skill_files(skill_dir: Path) -> List[Path]:
+    files = [skill_dir / "SKILL.md"]
+    agent_config = skill_dir / "agents" / "openai.yaml"
+    if agent_config.is_file():
+        files.append(agent_config)
+    references = skill_dir / "references"
+    if references.is_dir():
+        files.extend(sorted(p for p in references.iterdir() if p.is_file() and p.suffix == ".md"))
+    return files
+
+
+def split_sections(text: str) -> List[Dict[str, Any]]:
+    """Split markdown at headings up to SPLIT_LEVEL, ignoring fenced code.
+
+    Text before the first heading (e.g. front matter) is kept with the first
+    section so nothing is dropped.
+    """
+    sections: List[Dict[str, Any]] = []
+    current: Dict[str, Any] = {"title": None, "level": 0, "path": [], "lines": []}
+    stack: List[Tuple[int, str]] = []
+    in_fence = False
+
+    for line in text.splitlines(keepends=True):
+        if _FENCE.match(line):
+            in_fence = not in_fence
+        match = None if in_fence else _HEADING.match(line)
+        if match and len(match.group(1)) <= SPLIT_LEVEL:
+            level, title = len(match.group(1)), match.group(2)
+            if current["title"] is not None:
+                sections.append(current)
+                current = {"lines": []}
+            while stack and stack[-1][0] >= level:
+                stack.pop()
+            stack.append((level, title))
+            current.update(title=title, level=level, path=[t for _, t in stack])
+        current["lines"].append(line)
+    if current["lines"]:
+        sections.append(current)
+
+    out: List[Dict[str, Any]] = []
+    seen: Dict[str, int] = {}
+    for section in sections:
+        body = "".join(section["lines"])
+        if not body.strip():
+            continue
+        slug = _slug(section["title"] or "preamble")
+        seen[slug] = seen.get(slug, 0) + 1
+        if seen[slug] > 1:
+            slug = f"{slug}-{seen[slug]}"
+        out.append({
+            "slug": slug,
+            "title": section["title"],
+            "path": section["path"],
+            "text": body,
+        })
+    return out
+
+
+def _front_matter(text: str) -> Dict[str, str]:
+    if not text.startswith("---"):
+        return {}
+    end = text.find("\n---", 3)
+    if end == -1:
+        return {}
+    meta: Dict[str, str] = {}
+    for line in text[3:end].splitlines():
+        key, sep, value = line.partition(":")
+        if sep and key.strip() and not key.startswith(" "):
+            meta[key.strip()] = value.strip()
+    return meta
+
+
+class FileCache:
+    """Content hashes keyed by path, reused while size and mtime are unchanged"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if path.is_file():
+            try:
+                self.entries = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                self.entries = {}
+
+    def digest(self, file_path: Path) -> str:
+        key = str(file_path.relative_to(SKILLS_ROOT))
+        stat = file_path.stat()
+        entry = self.entries.get(key)
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return entry["sha256"]
+        digest = _sha256(file_path.read_bytes())
+        self.entries[key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest}
+        return digest
+
+    def save(self) -> None:
+        self.path.write_text(json.dumps(self.entries, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+
+
+def build_skill(skill_dir: Path, files: List[Path]) -> Dict[str, Any]:
+    bundle_files = []
+    for file_path in files:
+        text = file_path.read_text(encoding="utf-8")
+        relative = file_path.relative_to(skill_dir).as_posix()
+        if file_path.suffix == ".md":
+            sections = split_sections(text)
+        else:
+            sections = [{"slug": "config", "title": None, "path": [], "text": text}]
+        for section in sections:
+            section["id"] = f"{skill_dir.name}/{relative}#{section['slug']}"
+            section["chars"] = len(section["text"])
+            section["tokens"] = _estimate_tokens(section["text"])
+            section["sha256"] = _sha256(section["text"].encode("utf-8"))[:16]
+        bundle_files.append({"path": relative, "sections": sections})
+
+    meta = _front_matter((skill_dir / "SKILL.md").read_text(encoding="utf-8"))
+    return {
+        "name": skill_dir.name,
+        "description": meta.get("description", ""),
+        "files": bundle_files,
+    }
+
+
+def select_sections(
+    task: Dict[str, Any],
+    sections: List[Dict[str, Any]],
+) -> Tuple[List[str], List[str], List[str]]:
+    """Section ids for a task, in pattern order, within the token budget
+
+    Also returns the include patterns that matched no section at all, which
+    usually means a heading was renamed.
+    """
+    budget = task.get("max_tokens")
+    chosen: List[str] = []
+    skipped: List[str] = []
+    unmatched: List[str] = []
+    used = 0
+    for pattern in task["include"]:
+        if not any(fnmatch.fnmatchcase(s["id"], pattern) for s in sections):
+            unmatched.append(pattern)
+            continue
+        for section in sections:
+            sid = section["id"]
+            if sid in chosen or sid in skipped or not fnmatch.fnmatchcase(sid, pattern):
+                continue
+            if any(fnmatch.fnmatchcase(sid, ex) for ex in task.get("exclude", [])):
+                continue
+            if budget is not None and used + section["tokens"] > budget:
+                skipped.append(sid)
+                continue
+            chosen.append(sid)
+            used += section["tokens"]
+    return chosen, skipped, unmatched
+
+
+def build(out_dir: Path, force: bool = False, check: bool = False) -> int:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    cache = FileCache(out_dir / "cache.json")
+    manifest_path = out_dir / "manifest.json"
+    # Read even with --force: it lists the bundles of deleted skills to remove
+    previous: Dict[str, Any] = {}
+    if manifest_path.is_file():
+        try:
+            previous = json.loads(manifest_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            previous = {}
+
+    skill_dirs = sorted(
+        p for p in SKILLS_ROOT.iterdir()
+        if p.is_dir() and not p.name.startswith(".") and (p / "SKILL.md").is_file()
+    )
+
+    skills: Dict[str, Any] = {}
+    all_sections: List[Dict[str, Any]] = []
+    stale: List[str] = []
+    for skill_dir in skill_dirs:
+        files = _skill_files(skill_dir)
+        file_hashes = {f.relative_to(skill_dir).as_posix(): cache.digest(f) for f in files}
+        skill_hash = _sha256(json.dumps(file_hashes, sort_keys=True).encode("utf-8"))[:12]
+        bundle_name = f"{skill_dir.name}.{skill_hash}.json"
+        bundle_path = out_dir / bundle_name
+
+        old = previous.get("skills", {}).get(skill_dir.name)
+        if not force and old and old.get("hash") == skill_hash and bundle_path.is_file():
+            bundle = json.loads(bundle_path.read_text(encoding="utf-8"))
+            status = "unchanged"
+        else:
+            stale.append(skill_dir.name)
+            # Built in memory even for --check, so task patterns can be validated
+            bundle = build_skill(skill_dir, files)
+            bundle["hash"] = skill_hash
+            status = "stale"
+        if status == "stale" and not check:
+            bundle_path.write_text(json.dumps(bundle, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+            for old_bundle in out_dir.glob(f"{skill_dir.name}.*.json"):
+                if old_bundle.name != bundle_name:
+                    old_bundle.unlink()
+            status = "rebuilt"
+
+        sections = [s for f in bundle["files"] for s in f["sections"]]
+        all_sections.extend(sections)
+        skills[skill_dir.name] = {
+            "hash": skill_hash,
+            "bundle": bundle_name,
+            "description": bundle["description"],
+            "files": file_hashes,
+            "chars": sum(s["chars"] for s in sections),
+            "tokens": sum(s["tokens"] for s in sections),
+            "sections": [
+                {k: s[k] for k in ("id", "title", "path", "chars", "tokens", "sha256")}
+                for s in sections
+            ],
+        }
+        print(f"{status:>9}  {skill_dir.name:<24} {skills[skill_dir.name]['tokens']:>6} tokens  {bundle_name}")
+
+    gone = set(previous.get("skills", {})) - {p.name for p in skill_dirs}
+    by_id = {s["id"]: s for s in all_sections}
+    tasks: Dict[str, Any] = {}
+    unmatched: List[str] = []
+    for task_name, task in TASKS.items():
+        chosen, skipped, missing = select_sections(task, all_sections)
+        unmatched.extend(f"{task_name}: {pattern}" for pattern in missing)
+        tasks[task_name] = {
+            "description": task["description"],
+            "max_tokens": task.get("max_tokens"),
+            "sections": chosen,
+            "skipped_over_budget": skipped,
+            "unmatched_patterns": missing,
+            "chars": sum(by_id[s]["chars"] for s in chosen),
+            "tokens": sum(by_id[s]["tokens"] for s in chosen),
+        }
+    for line in unmatched:
+        print(f"No section matches task pattern {line}", file=sys.stderr)
+
+    if check:
+        stale.extend(sorted(gone))
+        if stale:
+            print(f"Stale bundles: {', '.join(stale)}", file=sys.stderr)
+        return 1 if stale or unmatched else 0
+    for name in gone:
+        for old_bundle in out_dir.glob(f"{name}.*.json"):
+            old_bundle.unlink()
+
+    manifest = {
+        "version": 1,
+        "chars_per_token": CHARS_PER_TOKEN,
+        "total_tokens": sum(s["tokens"] for s in all_sections),
+        "skills": skills,
+        "tasks": tasks,
+    }
+    text = json.dumps(manifest, indent=2, ensure_ascii=False) + "\n"
+    if not manifest_path.is_file() or manifest_path.read_text(encoding="utf-8") != text:
+        manifest_path.write_text(text, encoding="utf-8")
+    cache.save()
+
+    print()
+    for task_name, task in tasks.items():
+        print(
+            f"task {task_name:<20} {len(task['sections']):>3} sections {task['tokens']:>6} tokens"
+            f" (of {manifest['total_tokens']})"
+        )
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Build content-hashed skill bundles and a task manifest.")
+    parser.add_argument("--out", default=str(DEFAULT_OUT), help="Output directory (default: skills/.bundles)")
+    parser.add_argument("--force", action="store_true", help="Rebuild every bundle")
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Only report stale bundles and task patterns matching no section; exit 1 if any",
+    )
+    args = parser.parse_args(argv)
+    return build(Path(args.out), force=args.force, check=args.check)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark
+
+Reports per-module import time (from `python -X importtime`) and the time
+from process spawn to the first successful request.
+
+Usage:
+    uv run python bench_startup.py
+    uv run python bench_startup.py --module main --top 15 --runs 5 --output startup.json
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).resolve().parent
+
+
+def measure_imports(module: str) -> dict:
+    """Run `python -X importtime -c 'import <module>'` and parse its report"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        tail = [line for line in result.stderr.splitlines() if not line.startswith("import time:")]
+        raise RuntimeError(f"Importing {module} failed:\n" + "\n".join(tail[-10:]))
+
+    modules = []
+    for line in result.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        modules.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip())) // 2,
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000,
+        })
+
+    top_level = [m for m in modules if m["depth"] == 0]
+    return {
+        "total_ms": round(sum(m["cumulative_ms"] for m in top_level), 2),
+        "modules": modules,
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_first_request(app: str, path: str, timeout: float) -> float:
+    """Seconds from spawning uvicorn to the first 2xx response on `path`"""
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}{path}"
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--port", str(port), "--log-level", "warning"],
+        cwd=PROJECT_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError(f"Server exited early:\n{proc.stderr.read().decode()}")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if 200 <= response.status < 300:
+                        return time.perf_counter() - start
+            except (urllib.error.URLError, ConnectionError, OSError):
+                time.sleep(0.005)
+        raise TimeoutError(f"No successful response from {url} within {timeout}s")
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure import time and time to first request.")
+    parser.add_argument("--module", default="main", help="Module to import (default: main)")
+    parser.add_argument("--app", default="main:app", help="ASGI app for uvicorn (default: main:app)")
+    parser.add_argument("--path", default="/health", help="Path probed for the first request")
+    parser.add_argument("--runs", type=int, default=3, help="Cold starts to measure")
+    parser.add_argument("--top", type=int, default=10, help="Slowest modules to list")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Seconds to wait per start")
+    parser.add_argument("--output", help="Write the full report as JSON")
+    args = parser.parse_args()
+
+    imports = measure_imports(args.module)
+    slowest = sorted(imports["modules"], key=lambda m: m["cumulative_ms"], reverse=True)
+    print(f"Import of '{args.module}': {imports['total_ms']:.1f} ms")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for m in slowest[:args.top]:
+        print(f"{m['cumulative_ms']:>14.1f} {m['self_ms']:>9.1f}  {m['module']}")
+
+    samples = [measure_first_request(args.app, args.path, args.timeout) for _ in range(args.runs)]
+    first_request = {
+        "runs": args.runs,
+        "min_ms": round(min(samples) * 1000, 1),
+        "median_ms": round(statistics.median(samples) * 1000, 1),
+        "max_ms": round(max(samples) * 1000, 1),
+    }
+    print(
+        f"\nTime to first successful request ({args.path}, {args.runs} runs): "
+        f"min {first_request['min_ms']} ms, median {first_request['median_ms']} ms"
+    )
+
+    if args.output:
+        report = {
+            "python": sys.version.split()[0],
+            "bytecode_cache": os.environ.get("PYTHONDONTWRITEBYTECODE") != "1",
+            "imports": imports,
+            "first_request": first_request,
+        }
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Report written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
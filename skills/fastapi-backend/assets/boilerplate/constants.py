@@ -2,7 +2,8 @@
 Constants for the application
 """
 
-import os
+from functools import lru_cache
+
 from pydantic_settings import BaseSettings
 
 
@@ -27,17 +28,54 @@ class Settings(BaseSettings):
     
     # CORS
     allowed_origins: str = "*"
+
+    # LLM backend: "openai", or "fake" for tests and load tests
+    llm_backend: str = "openai"
+    fake_llm_latency: float = 0.05  # seconds per fake completion
+
+    # LLM response cache
+    llm_cache_ttl_seconds: int = 300
+    llm_cache_max_entries: int = 1024
+    llm_cache_dir: str = ""  # Empty disables the on-disk tier
+    llm_cache_disk_max_entries: int = 10_000  # Oldest files are pruned past this
+
+    # Production serving (set by serve.py)
+    web_concurrency: int = 1  # Worker processes sharing the upstream limits
+    shared_cache_socket: str = ""  # Unix socket of the cross-process cache
+
+    # Upstream scheduler (per provider, for the whole deployment)
+    upstream_requests_per_minute: int = 500
+    upstream_tokens_per_minute: int = 200_000
+    upstream_max_concurrency: int = 16
+    upstream_interactive_reserve: int = 4  # Slots background work may not use
+    upstream_interactive_timeout: float = 30.0  # Seconds a request may queue before 503
     
     class Config:
         env_file = ".env"
         case_sensitive = False
 
 
-# Initialize settings
-settings = Settings()
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Build settings on first use (reads env/.env once, not at import time)"""
+    return Settings()
+
+
+def __getattr__(name: str):
+    # Keep `from constants import settings` working without eager construction
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Additional constants
 DEFAULT_MODEL = "gpt-4-turbo"
 DEFAULT_GEMINI_MODEL = "gemini-2.0-flash-exp"
 MAX_TOKENS = 4096
 TEMPERATURE = 0.7
+
+# /health reports "degraded" past these thresholds
+HEALTH_MAX_LOOP_LAG = 0.25  # seconds
+HEALTH_MAX_POOL_SATURATION = 0.9
+
+# With several workers, each publishes its metrics this often (seconds)
+METRICS_PUBLISH_INTERVAL = 5.0
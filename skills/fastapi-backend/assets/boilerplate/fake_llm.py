@@ -0,0 +1,88 @@
+"""
+Local fake LLM provider for tests and benchmarks
+
+Behaves like a rate-limited provider without network access or API keys:
+configurable latency, streaming chunks, and 429 responses (raised as
+`scheduler.RateLimited`) either on a fixed schedule or when its own
+requests-per-minute window is exceeded.
+
+Usage:
+    from fake_llm import FakeLLM
+
+    llm = FakeLLM(latency=0.05, requests_per_minute=60, retry_after=0.5)
+    text = await scheduler.run(lambda: llm.complete("Review Dune"))
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import AsyncIterator, Optional
+
+from scheduler import RateLimited
+
+
+class FakeLLM:
+    """In-process stand-in for an LLM provider"""
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        chunks: int = 8,
+        requests_per_minute: Optional[int] = None,
+        rate_limit_every: int = 0,
+        retry_after: float = 1.0,
+    ):
+        self.latency = latency
+        self.chunks = chunks
+        self.requests_per_minute = requests_per_minute
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+
+        self.calls = 0
+        self.rate_limited = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._window: deque = deque()
+
+    def _admit(self) -> None:
+        """Apply the configured rate-limit behaviour to one incoming call"""
+        self.calls += 1
+        now = time.monotonic()
+        if self.rate_limit_every and self.calls % self.rate_limit_every == 0:
+            self.rate_limited += 1
+            raise RateLimited(self.retry_after, "fake provider: scheduled 429")
+        if self.requests_per_minute is not None:
+            while self._window and self._window[0] <= now - 60:
+                self._window.popleft()
+            if len(self._window) >= self.requests_per_minute:
+                self.rate_limited += 1
+                raise RateLimited(
+                    max(0.0, self._window[0] + 60 - now), "fake provider: requests per minute exceeded"
+                )
+            self._window.append(now)
+
+    def _text(self, prompt: str) -> str:
+        return f"Fake response to: {prompt[:80]}"
+
+    async def complete(self, prompt: str, max_tokens: int = 256) -> str:
+        self._admit()
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            return self._text(prompt)
+        finally:
+            self.in_flight -= 1
+
+    async def stream(self, prompt: str, max_tokens: int = 256) -> AsyncIterator[str]:
+        self._admit()
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            text = self._text(prompt)
+            step = max(1, -(-len(text) // self.chunks))
+            for start in range(0, len(text), step):
+                await asyncio.sleep(self.latency / self.chunks)
+                yield text[start:start + step]
+        finally:
+            self.in_flight -= 1
@@ -0,0 +1,450 @@
+"""
+LLM response cache with single-flight request coalescing
+
+Identical requests (same model, prompt and generation parameters) share one
+upstream call while it is in flight, and finished responses are kept in a
+TTL + LRU memory cache with optional shared (cross-process, see
+shared_cache.py) and on-disk tiers. Coalesced streaming requests receive
+chunks as the upstream produces them, and cached responses are replayed
+through the streaming path so streaming endpoints benefit as well.
+
+The upstream call runs in its own task: if the request that started it goes
+away, the call keeps going for the others and is only cancelled once nobody
+is waiting on it.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+
+from constants import MAX_TOKENS, TEMPERATURE, get_settings
+
+logger = logging.getLogger(__name__)
+
+
+class CallAborted(RuntimeError):
+    """Raised to coalesced waiters when the shared upstream call is cancelled"""
+
+
+def make_cache_key(
+    model: str,
+    prompt: str,
+    *,
+    temperature: float = TEMPERATURE,
+    max_tokens: int = MAX_TOKENS,
+    **params: Any,
+) -> str:
+    """Build a stable cache key from the model, prompt hash and parameters"""
+    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    payload = json.dumps(
+        {
+            "model": model,
+            "prompt": prompt_hash,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "params": params,
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CacheStats:
+    """Counters for cache effectiveness"""
+
+    memory_hits: int = 0
+    shared_hits: int = 0
+    disk_hits: int = 0
+    coalesced: int = 0
+    misses: int = 0
+    evictions: int = 0
+    errors: int = 0
+    write_errors: int = 0
+
+    @property
+    def requests(self) -> int:
+        return (
+            self.memory_hits + self.shared_hits + self.disk_hits + self.coalesced + self.misses
+        )
+
+    @property
+    def hit_rate(self) -> float:
+        """Share of requests served without a new upstream call"""
+        if not self.requests:
+            return 0.0
+        return (self.requests - self.misses) / self.requests
+
+    def as_dict(self) -> dict:
+        data = asdict(self)
+        data["requests"] = self.requests
+        data["hit_rate"] = round(self.hit_rate, 4)
+        return data
+
+
+class TTLCache:
+    """In-memory cache with per-entry expiry and LRU eviction"""
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: str) -> int:
+        """Store a value and return how many entries were evicted"""
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        evicted = 0
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            evicted += 1
+        return evicted
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class DiskCache:
+    """One JSON file per entry; survives restarts and is shared by workers on one host
+
+    Expired entries are only noticed when read, so `set` also prunes the
+    directory every `prune_interval` seconds: expired entries and leftover
+    temp files are removed, then the oldest entries until `max_entries` remain.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        ttl_seconds: float,
+        max_entries: int = 10_000,
+        prune_interval: float = 60.0,
+    ):
+        self.directory = Path(directory)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.prune_interval = prune_interval
+        self._next_prune = 0.0
+        self._writes = 0
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if entry.get("expires_at", 0) < time.time():
+            path.unlink(missing_ok=True)
+            return None
+        return entry.get("value")
+
+    def set(self, key: str, value: str) -> int:
+        """Store a value and return how many entries were pruned"""
+        path = self._path(key)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        entry = {"expires_at": time.time() + self.ttl_seconds, "value": value}
+        try:
+            tmp.write_text(json.dumps(entry), encoding="utf-8")
+            os.replace(tmp, path)
+        except OSError:
+            tmp.unlink(missing_ok=True)
+            raise
+        self._writes += 1
+        now = time.monotonic()
+        # Sweep on schedule, or early after a burst of a tenth of the bound
+        if now < self._next_prune and self._writes < self.max_entries // 10 + 1:
+            return 0
+        return self.prune()
+
+    def prune(self) -> int:
+        """Remove expired entries, stale temp files and the oldest entries over the bound"""
+        self._next_prune = time.monotonic() + self.prune_interval
+        self._writes = 0
+        now = time.time()
+        removed = 0
+        live: list[tuple[float, Path]] = []
+        for path in self.directory.iterdir():
+            if path.suffix not in (".json", ".tmp"):
+                continue
+            try:
+                mtime = path.stat().st_mtime
+            except OSError:
+                continue  # Removed by another worker
+            # Files are written once per entry, so mtime + TTL is the expiry;
+            # a .tmp that old was left behind by a crashed writer
+            if mtime + self.ttl_seconds < now:
+                path.unlink(missing_ok=True)
+                removed += 1
+            elif path.suffix == ".json":
+                live.append((mtime, path))
+        if len(live) > self.max_entries:
+            live.sort()
+            for _, path in live[: len(live) - self.max_entries]:
+                path.unlink(missing_ok=True)
+                removed += 1
+        return removed
+
+
+class _Flight:
+    """One upstream call shared by every request for the same key
+
+    The call runs in its own task so it outlives whichever request started it;
+    it is only cancelled once no request is waiting on it any more.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        # Subscribers may all be gone by the time an error lands; mark it retrieved
+        self.future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self.chunks: list[str] = []
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self.changed = asyncio.Event()
+
+    def notify(self) -> None:
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    def push(self, chunk: str) -> None:
+        self.chunks.append(chunk)
+        self.notify()
+
+
+class LLMCache:
+    """Coalesce identical in-flight LLM calls and cache their results"""
+
+    def __init__(
+        self,
+        ttl_seconds: float = 300,
+        max_entries: int = 1024,
+        disk_dir: str = "",
+        replay_chunk_size: int = 64,
+        shared=None,
+        disk_max_entries: int = 10_000,
+    ):
+        self.memory = TTLCache(ttl_seconds, max_entries)
+        self.disk = DiskCache(disk_dir, ttl_seconds, disk_max_entries) if disk_dir else None
+        # Any object with async get(key) / set(key, value), e.g. SharedCacheClient
+        self.shared = shared
+        self.replay_chunk_size = replay_chunk_size
+        self.stats = CacheStats()
+        self._inflight: dict[str, _Flight] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    def _memory_lookup(self, key: str) -> Optional[str]:
+        value = self.memory.get(key)
+        if value is not None:
+            self.stats.memory_hits += 1
+        return value
+
+    async def _tier_lookup(self, key: str) -> Optional[str]:
+        """Check the shared and disk tiers, promoting hits to memory"""
+        value = None
+        if self.shared is not None:
+            value = await self.shared.get(key)
+            if value is not None:
+                self.stats.shared_hits += 1
+        if value is None and self.disk is not None:
+            value = await asyncio.to_thread(self.disk.get, key)
+            if value is not None:
+                self.stats.disk_hits += 1
+        if value is not None:
+            self.stats.evictions += self.memory.set(key, value)
+        return value
+
+    async def _store(self, flight: _Flight, value: str) -> None:
+        """Cache a finished response and hand it to coalesced waiters"""
+        self.stats.evictions += self.memory.set(flight.key, value)
+        self._finish(flight, value)
+        # Waiters already have the value; a failed tier write only costs a
+        # future miss, so count it instead of failing the detached task
+        if self.shared is not None:
+            try:
+                await self.shared.set(flight.key, value)
+            except Exception as exc:
+                self.stats.write_errors += 1
+                logger.warning("Shared cache write failed: %s", exc)
+        if self.disk is not None:
+            try:
+                self.stats.evictions += await asyncio.to_thread(self.disk.set, flight.key, value)
+            except Exception as exc:
+                self.stats.write_errors += 1
+                logger.warning("Disk cache write failed: %s", exc)
+
+    def _finish(
+        self,
+        flight: _Flight,
+        value: Optional[str] = None,
+        error: Optional[BaseException] = None,
+    ) -> None:
+        if self._inflight.get(flight.key) is flight:
+            del self._inflight[flight.key]
+        if flight.future.done():
+            return
+        if error is not None:
+            self.stats.errors += 1
+            flight.future.set_exception(error)
+        else:
+            flight.future.set_result(value)
+        flight.notify()
+
+    async def _produce(
+        self, flight: _Flight, produce: Callable[[_Flight], Awaitable[str]]
+    ) -> None:
+        try:
+            value = await self._tier_lookup(flight.key)
+            if value is not None:
+                self._finish(flight, value)
+                return
+            self.stats.misses += 1
+            value = await produce(flight)
+        except asyncio.CancelledError:
+            self._finish(flight, error=CallAborted("upstream call was cancelled"))
+            raise
+        except Exception as exc:
+            self._finish(flight, error=exc)
+            return
+        await self._store(flight, value)
+
+    def _join(
+        self, key: str, produce: Callable[[_Flight], Awaitable[str]]
+    ) -> _Flight:
+        """Subscribe to the in-flight call for ``key``, starting it if needed"""
+        flight = self._inflight.get(key)
+        if flight is None:
+            flight = self._inflight[key] = _Flight(key)
+            flight.task = asyncio.create_task(self._produce(flight, produce))
+            self._tasks.add(flight.task)
+            flight.task.add_done_callback(self._tasks.discard)
+        else:
+            self.stats.coalesced += 1
+        flight.subscribers += 1
+        return flight
+
+    def _leave(self, flight: _Flight) -> None:
+        flight.subscribers -= 1
+        if flight.subscribers == 0 and not flight.future.done():
+            # Nobody is waiting: stop paying for the call, and let the next
+            # request for this key start a fresh one
+            if self._inflight.get(flight.key) is flight:
+                del self._inflight[flight.key]
+            flight.task.cancel()
+
+    async def get_or_call(self, key: str, call: Callable[[], Awaitable[str]]) -> str:
+        """Return a cached response, join an in-flight call, or make the call"""
+
+        async def produce(flight: _Flight) -> str:
+            return await call()
+
+        while True:
+            value = self._memory_lookup(key)
+            if value is not None:
+                return value
+            flight = self._join(key, produce)
+            try:
+                return await asyncio.shield(flight.future)
+            except CallAborted:
+                # The shared call was cancelled under us: lead a fresh one
+                continue
+            finally:
+                self._leave(flight)
+
+    async def _replay(self, value: str) -> AsyncIterator[str]:
+        size = self.replay_chunk_size
+        for start in range(0, len(value), size):
+            yield value[start:start + size]
+            await asyncio.sleep(0)
+
+    async def _follow(self, flight: _Flight) -> AsyncIterator[str]:
+        """Yield chunks as the shared call produces them"""
+        index = sent = 0
+        while True:
+            changed = flight.changed
+            while index < len(flight.chunks):
+                chunk = flight.chunks[index]
+                index += 1
+                sent += len(chunk)
+                yield chunk
+            if flight.future.done():
+                break
+            await changed.wait()
+        value = flight.future.result()
+        # Non-streaming calls and tier hits push no chunks: replay the rest
+        async for chunk in self._replay(value[sent:]):
+            yield chunk
+
+    async def stream_or_call(
+        self, key: str, stream: Callable[[], AsyncIterator[str]]
+    ) -> AsyncIterator[str]:
+        """Stream a response; coalesced requests receive chunks as they arrive"""
+
+        async def produce(flight: _Flight) -> str:
+            async for chunk in stream():
+                flight.push(chunk)
+            return "".join(flight.chunks)
+
+        sent = False
+        while True:
+            value = self._memory_lookup(key)
+            if value is not None:
+                async for chunk in self._replay(value):
+                    yield chunk
+                return
+            flight = self._join(key, produce)
+            try:
+                async for chunk in self._follow(flight):
+                    sent = True
+                    yield chunk
+                return
+            except CallAborted:
+                # A fresh call can produce different text, so only restart
+                # if this client has not received any of the old one yet
+                if sent:
+                    raise
+            finally:
+                self._leave(flight)
+
+    def clear(self) -> None:
+        self.memory.clear()
+
+
+@lru_cache(maxsize=1)
+def get_llm_cache() -> LLMCache:
+    """Shared instance for the app, built from settings on first use"""
+    from shared_cache import get_shared_cache
+
+    settings = get_settings()
+    return LLMCache(
+        ttl_seconds=settings.llm_cache_ttl_seconds,
+        max_entries=settings.llm_cache_max_entries,
+        disk_dir=settings.llm_cache_dir,
+        disk_max_entries=settings.llm_cache_disk_max_entries,
+        shared=get_shared_cache(),
+    )
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Single-worker vs multi-worker throughput
+
+Runs the same suite from `scenarios.json` against `serve.py` with one worker
+and with N workers (shared cache on), using the fake LLM backend.
+
+Usage:
+    uv run python loadtest/compare_workers.py
+    uv run python loadtest/compare_workers.py --workers 8 --suite llm --duration 20
+    uv run python loadtest/compare_workers.py --no-shared-cache   # private caches per worker
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+from loadgen import DEFAULT_SCENARIOS, PROJECT_DIR, run_suites, spawned_server
+
+sys.path.insert(0, str(PROJECT_DIR))
+from serve import default_workers  # noqa: E402
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare single- and multi-worker throughput.")
+    parser.add_argument("--workers", type=int, default=default_workers(), help="Workers for the multi-worker run")
+    parser.add_argument("--suite", default="llm", help="Suite from scenarios.json")
+    parser.add_argument("--scenarios", default=str(DEFAULT_SCENARIOS))
+    parser.add_argument("--duration", type=float, help="Seconds per run (overrides file)")
+    parser.add_argument("--concurrency", type=int, help="Concurrent clients (overrides file)")
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--request-timeout", type=float, default=30.0)
+    parser.add_argument("--no-shared-cache", action="store_true")
+    parser.add_argument("--output", help="Write both results as JSON")
+    args = parser.parse_args()
+
+    suite = json.loads(Path(args.scenarios).read_text())["suites"][args.suite]
+    results = {}
+    for workers in sorted({1, args.workers}):
+        command = [
+            sys.executable, "serve.py", "--workers", str(workers),
+            "--host", "127.0.0.1", "--log-level", "warning",
+        ]
+        if args.no_shared_cache:
+            command.append("--no-shared-cache")
+        print(f"\n=== {workers} worker(s) ===")
+        with spawned_server(command) as url:
+            results[workers] = asyncio.run(run_suites({args.suite: suite}, args, url))[args.suite]
+
+    single = results[1]["total"]
+    print(f"\n{'workers':>8} {'rps':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'speedup':>8}")
+    for workers, result in results.items():
+        total = result["total"]
+        speedup = total["rps"] / single["rps"] if single["rps"] else 0.0
+        print(
+            f"{workers:>8} {total['rps']:>10.1f} {total['p50_ms']:>9.2f} "
+            f"{total['p95_ms']:>9.2f} {total['p99_ms']:>9.2f} {speedup:>7.2f}x"
+        )
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
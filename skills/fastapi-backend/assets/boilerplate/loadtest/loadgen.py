@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Async load generator and benchmark suite
+
+Drives the weighted request mixes in `scenarios.json` against the app with the
+fake LLM backend (LLM_BACKEND=fake), reports p50/p95/p99 latency and RPS per
+scenario, and records or compares against a saved baseline.
+
+Usage:
+    uv run python loadtest/loadgen.py                        # all suites, spawns a local server
+    uv run python loadtest/loadgen.py --suite llm --duration 30 --concurrency 128
+    uv run python loadtest/loadgen.py --url http://localhost:8000   # already running server
+    uv run python loadtest/loadgen.py --in-process           # ASGI transport, no sockets
+    uv run python loadtest/loadgen.py --save-baseline        # write loadtest/baseline.json
+    uv run python loadtest/loadgen.py --compare              # exit 1 on regression vs baseline
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import signal
+import socket
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+import httpx
+
+LOADTEST_DIR = Path(__file__).resolve().parent
+PROJECT_DIR = LOADTEST_DIR.parent
+DEFAULT_SCENARIOS = LOADTEST_DIR / "scenarios.json"
+DEFAULT_BASELINE = LOADTEST_DIR / "baseline.json"
+
+# Server environment for load tests (existing env vars win). Upstream limits are
+# lifted so results measure the app, not the scheduler's provider throttling.
+LOADTEST_ENV = {
+    "LLM_BACKEND": "fake",
+    "UPSTREAM_REQUESTS_PER_MINUTE": "10000000",
+    "UPSTREAM_TOKENS_PER_MINUTE": "10000000000",
+    "UPSTREAM_MAX_CONCURRENCY": "1024",
+}
+
+
+@dataclass
+class Scenario:
+    """One weighted request type in a mix"""
+
+    name: str
+    method: str
+    path: str
+    weight: float = 1.0
+    json: Any = None
+    unique: int = 0  # Number of distinct values substituted for "{n}"
+
+    def body(self, rng: random.Random) -> Any:
+        if self.json is None:
+            return None
+        n = str(rng.randrange(self.unique)) if self.unique else "0"
+        return _substitute(self.json, n)
+
+
+def _substitute(value: Any, n: str) -> Any:
+    if isinstance(value, str):
+        return value.replace("{n}", n)
+    if isinstance(value, dict):
+        return {k: _substitute(v, n) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_substitute(v, n) for v in value]
+    return value
+
+
+@dataclass
+class Samples:
+    latencies: list[float] = field(default_factory=list)
+    errors: int = 0
+
+
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def _summarize(samples: Samples, wall: float) -> dict:
+    values = sorted(samples.latencies)
+    return {
+        "requests": len(values),
+        "errors": samples.errors,
+        "rps": round(len(values) / wall, 1) if wall else 0.0,
+        "p50_ms": round(_percentile(values, 50) * 1000, 2),
+        "p95_ms": round(_percentile(values, 95) * 1000, 2),
+        "p99_ms": round(_percentile(values, 99) * 1000, 2),
+        "max_ms": round(values[-1] * 1000, 2) if values else 0.0,
+    }
+
+
+async def run_mix(
+    client: httpx.AsyncClient,
+    scenarios: list[Scenario],
+    duration: float,
+    concurrency: int,
+    seed: int = 0,
+) -> dict:
+    """Closed-loop load: `concurrency` workers send requests back to back for `duration`"""
+    rng = random.Random(seed)
+    weights = [s.weight for s in scenarios]
+    per_scenario = {s.name: Samples() for s in scenarios}
+    stop_at = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < stop_at:
+            scenario = rng.choices(scenarios, weights)[0]
+            body = scenario.body(rng)
+            start = time.perf_counter()
+            try:
+                response = await client.request(scenario.method, scenario.path, json=body)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            samples = per_scenario[scenario.name]
+            if ok:
+                samples.latencies.append(time.perf_counter() - start)
+            else:
+                samples.errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+
+    total = Samples()
+    for samples in per_scenario.values():
+        total.latencies.extend(samples.latencies)
+        total.errors += samples.errors
+    return {
+        "total": _summarize(total, wall),
+        "scenarios": {name: _summarize(s, wall) for name, s in per_scenario.items()},
+    }
+
+
+async def run_suite(client: httpx.AsyncClient, suite: dict, args: argparse.Namespace) -> dict:
+    scenarios = [Scenario(**entry) for entry in suite["mix"]]
+    duration = args.duration or suite.get("duration", 10)
+    concurrency = args.concurrency or suite.get("concurrency", 32)
+    if args.warmup > 0:
+        await run_mix(client, scenarios, args.warmup, concurrency, seed=args.seed + 1)
+    result = await run_mix(client, scenarios, duration, concurrency, seed=args.seed)
+    result["config"] = {"duration": duration, "concurrency": concurrency}
+    return result
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _stop_group(proc: subprocess.Popen, timeout: float = 10.0) -> None:
+    """SIGTERM the server's process group, then SIGKILL whatever is left"""
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        return
+    try:
+        proc.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        pass
+    try:
+        # Children (uvicorn workers, the cache server) may outlive the parent
+        os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    proc.wait()
+
+
+@contextmanager
+def spawned_server(command: Optional[list[str]] = None, timeout: float = 30.0) -> Iterator[str]:
+    """Start the app with the fake LLM backend and yield its base URL
+
+    `command` defaults to a single uvicorn process; `--port <free port>` is appended.
+    """
+    port = _free_port()
+    env = {**LOADTEST_ENV, **os.environ}
+    if command is None:
+        command = [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--log-level", "warning", "--no-access-log",
+        ]
+    # Own process group, so worker and cache-server children are stopped too
+    proc = subprocess.Popen(
+        [*command, "--port", str(port)], cwd=PROJECT_DIR, env=env, start_new_session=True
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError("Server exited before becoming healthy")
+            try:
+                if httpx.get(f"{url}/health", timeout=1).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Server at {url} not healthy within {timeout}s")
+            time.sleep(0.05)
+        yield url
+    finally:
+        _stop_group(proc)
+
+
+def _client(args: argparse.Namespace, base_url: Optional[str], concurrency: int) -> httpx.AsyncClient:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    if base_url is None:
+        sys.path.insert(0, str(PROJECT_DIR))
+        for key, value in LOADTEST_ENV.items():
+            os.environ.setdefault(key, value)
+        from main import app
+
+        transport = httpx.ASGITransport(app=app)
+        return httpx.AsyncClient(transport=transport, base_url="http://app", timeout=args.request_timeout)
+    return httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.request_timeout)
+
+
+async def run_suites(suites: dict, args: argparse.Namespace, base_url: Optional[str]) -> dict:
+    results = {}
+    for name, suite in suites.items():
+        concurrency = args.concurrency or suite.get("concurrency", 32)
+        async with _client(args, base_url, concurrency) as client:
+            print(f"▶ {name}: {suite.get('description', '')}")
+            results[name] = await run_suite(client, suite, args)
+            print_result(results[name])
+    return results
+
+
+def print_result(result: dict) -> None:
+    header = f"  {'scenario':<20} {'requests':>9} {'errors':>7} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+    print(header)
+    rows = list(result["scenarios"].items()) + [("TOTAL", result["total"])]
+    for name, r in rows:
+        print(
+            f"  {name:<20} {r['requests']:>9} {r['errors']:>7} {r['rps']:>9.1f} "
+            f"{r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f}"
+        )
+
+
+def compare(baseline: dict, results: dict, tolerance: float) -> list[str]:
+    """Regressions of each suite total vs the baseline (latency up or RPS down by > tolerance)"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if previous is None:
+            continue
+        before, after = previous["total"], current["total"]
+        for metric in ("p50_ms", "p95_ms"):
+            if before[metric] and after[metric] > before[metric] * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {before[metric]} -> {after[metric]}")
+        if before["rps"] and after["rps"] < before["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: rps {before['rps']} -> {after['rps']}")
+        if after["errors"] > before["errors"]:
+            regressions.append(f"{name}: errors {before['errors']} -> {after['errors']}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load test the app with the fake LLM backend.")
+    parser.add_argument("--scenarios", default=str(DEFAULT_SCENARIOS), help="Scenario file")
+    parser.add_argument("--suite", action="append", help="Suite(s) to run (default: all)")
+    parser.add_argument("--duration", type=float, help="Seconds per suite (overrides file)")
+    parser.add_argument("--concurrency", type=int, help="Concurrent workers (overrides file)")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Unmeasured warmup seconds")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the request mix")
+    parser.add_argument("--request-timeout", type=float, default=30.0, help="Per-request timeout")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", help="Target an already running server")
+    target.add_argument("--in-process", action="store_true", help="Call the ASGI app directly")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="Baseline file")
+    parser.add_argument("--save-baseline", action="store_true", help="Write results as the new baseline")
+    parser.add_argument("--compare", action="store_true", help="Fail on regression vs the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed regression (0.2 = 20%%)")
+    parser.add_argument("--output", help="Also write results JSON here")
+    args = parser.parse_args()
+
+    suites = json.loads(Path(args.scenarios).read_text())["suites"]
+    if args.suite:
+        unknown = set(args.suite) - set(suites)
+        if unknown:
+            parser.error(f"Unknown suite(s): {', '.join(sorted(unknown))}")
+        suites = {name: suites[name] for name in args.suite}
+
+    if args.in_process:
+        results = asyncio.run(run_suites(suites, args, None))
+        mode = "in-process"
+    elif args.url:
+        results = asyncio.run(run_suites(suites, args, args.url.rstrip("/")))
+        mode = "external"
+    else:
+        with spawned_server() as url:
+            results = asyncio.run(run_suites(suites, args, url))
+        mode = "spawned"
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "mode": mode,
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+
+    status = 0
+    baseline_path = Path(args.baseline)
+    if args.compare:
+        if not baseline_path.exists():
+            print(f"\nNo baseline at {baseline_path}; run with --save-baseline first")
+            status = 1
+        else:
+            baseline = json.loads(baseline_path.read_text())
+            if baseline.get("mode") != mode:
+                print(f"\n⚠️  Baseline was recorded in '{baseline.get('mode')}' mode, this run is '{mode}'")
+            regressions = compare(baseline, results, args.tolerance)
+            if regressions:
+                print(f"\n❌ Regressions beyond {args.tolerance:.0%}:")
+                for line in regressions:
+                    print(f"  - {line}")
+                status = 1
+            else:
+                print(f"\n✅ No regressions beyond {args.tolerance:.0%} vs {baseline_path}")
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"\nBaseline saved to {baseline_path}")
+    return status
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
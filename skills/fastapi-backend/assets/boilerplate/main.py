@@ -3,20 +3,60 @@ FastAPI Backend - Main Application
 Managed with uv
 """
 
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
-import os
-from dotenv import load_dotenv
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+
+from constants import (
+    DEFAULT_MODEL,
+    HEALTH_MAX_LOOP_LAG,
+    HEALTH_MAX_POOL_SATURATION,
+    METRICS_PUBLISH_INTERVAL,
+    get_settings,
+)
+from llm_cache import get_llm_cache, make_cache_key
+from metrics import (
+    EVENT_LOOP_LAG,
+    IN_FLIGHT,
+    MetricsMiddleware,
+    monitor_event_loop_lag,
+    publish_metrics,
+    registry,
+    render_merged,
+    thread_pool_usage,
+    track_upstream,
+)
+from providers import get_llm
+from scheduler import DeadlineExceeded, Priority, RateLimited, estimate_tokens, get_scheduler
+from shared_cache import get_shared_cache
+
+# Settings (.env included) are read lazily via constants.get_settings();
+# provider SDKs are imported on first use in providers.py. Keep this module's
+# imports light - everything here runs before the first request is served.
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background monitors for the lifetime of the app"""
+    tasks = [asyncio.create_task(monitor_event_loop_lag())]
+    shared = get_shared_cache()
+    if get_settings().web_concurrency > 1 and shared is not None:
+        tasks.append(asyncio.create_task(publish_metrics(shared, METRICS_PUBLISH_INTERVAL)))
+    yield
+    for task in tasks:
+        task.cancel()
 
-# Load environment variables
-load_dotenv()
 
 # Initialize FastAPI app
 app = FastAPI(
     title="FastAPI Backend",
     description="Backend API built with FastAPI and uv",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -28,6 +68,37 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Record latency/size/concurrency for every request (outermost middleware)
+app.add_middleware(MetricsMiddleware)
+
+# Scrape-time gauges for state owned by other modules
+CACHE_REQUESTS = registry.gauge(
+    "llm_cache_requests", "LLM cache lookups by result", ("result",)
+)
+CACHE_HIT_RATIO = registry.gauge(
+    "llm_cache_hit_ratio", "Share of LLM calls served from cache", aggregate="worker"
+)
+CACHE_WRITE_ERRORS = registry.gauge("llm_cache_write_errors", "Failed shared/disk cache writes")
+THREAD_POOL_BUSY = registry.gauge("thread_pool_busy", "Worker threads in use")
+THREAD_POOL_SATURATION = registry.gauge(
+    "thread_pool_saturation", "Worker threads in use / pool size", aggregate="max"
+)
+
+
+def _collect_runtime_metrics():
+    stats = get_llm_cache().stats
+    for result in ("memory_hits", "shared_hits", "disk_hits", "coalesced", "misses", "errors"):
+        CACHE_REQUESTS.set(getattr(stats, result), result)
+    CACHE_HIT_RATIO.set(stats.hit_rate)
+    CACHE_WRITE_ERRORS.set(stats.write_errors)
+    pool = thread_pool_usage()
+    if pool is not None:
+        THREAD_POOL_BUSY.set(pool["busy"])
+        THREAD_POOL_SATURATION.set(pool["saturation"])
+
+
+registry.on_collect(_collect_runtime_metrics)
+
 # ============================================================================
 # BASE ENDPOINTS
 # ============================================================================
@@ -40,14 +111,130 @@ async def hello_world():
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
-    return {"status": "healthy"}
+    """Health check with event-loop lag and pool saturation"""
+    loop_lag = EVENT_LOOP_LAG.get()
+    pool = thread_pool_usage()
+    degraded = loop_lag > HEALTH_MAX_LOOP_LAG or (
+        pool is not None and pool["saturation"] >= HEALTH_MAX_POOL_SATURATION
+    )
+    return {
+        "status": "degraded" if degraded else "healthy",
+        "event_loop_lag_ms": round(loop_lag * 1000, 2),
+        "in_flight_requests": int(IN_FLIGHT.get()),
+        "thread_pool": pool,
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics, combined across workers when serve.py runs several"""
+    if get_settings().web_concurrency <= 1:
+        return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+    # Each scrape reaches a random worker: answer for all of them, with this
+    # worker's numbers fresh and the others' at most one publish interval old
+    shared = get_shared_cache()
+    snapshots = None
+    if shared is not None:
+        snapshot = registry.snapshot()
+        await shared.publish(snapshot["worker"], snapshot)
+        snapshots = await shared.collect()
+    if not snapshots:
+        # One worker's numbers would look like counter resets; fail the scrape
+        raise HTTPException(
+            status_code=503,
+            detail="metrics of multiple workers need the shared cache server (serve.py without --no-shared-cache)",
+        )
+    return PlainTextResponse(
+        render_merged(snapshots, stale_after=3 * METRICS_PUBLISH_INTERVAL),
+        media_type="text/plain; version=0.0.4",
+    )
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """LLM response cache hit-rate metrics"""
+    cache = get_llm_cache()
+    return {**cache.stats.as_dict(), "entries": len(cache.memory)}
 
 
 # ============================================================================
 # ADDITIONAL ENDPOINTS
 # ============================================================================
 
+class CompletionRequest(BaseModel):
+    prompt: str
+    stream: bool = False
+
+
+def _upstream_error(exc: Exception) -> HTTPException:
+    """Map a scheduler failure to the status a client can act on"""
+    if isinstance(exc, RateLimited):
+        # Still throttled after the scheduler's retries
+        return HTTPException(
+            status_code=429,
+            detail=str(exc),
+            headers={"Retry-After": str(max(1, round(exc.retry_after)))},
+        )
+    return HTTPException(status_code=503, detail=str(exc))
+
+
+@app.post("/api/complete")
+async def complete(request: CompletionRequest):
+    """Example LLM endpoint: cached, coalesced, scheduled and instrumented"""
+    settings = get_settings()
+    backend = settings.llm_backend
+    llm = get_llm()
+    scheduler = get_scheduler(backend)
+    key = make_cache_key(DEFAULT_MODEL, request.prompt, backend=backend)
+    tokens = estimate_tokens(request.prompt)
+
+    if request.stream:
+        async def upstream_stream():
+            async with scheduler.slot(
+                Priority.INTERACTIVE, tokens=tokens, timeout=settings.upstream_interactive_timeout
+            ):
+                with track_upstream(backend, "stream"):
+                    async for chunk in llm.stream(request.prompt):
+                        yield chunk
+
+        # Wait for the first chunk before answering: queueing and provider
+        # 429s happen before it, so they still get a 503/429 instead of a
+        # 200 followed by a dropped connection
+        chunks = get_llm_cache().stream_or_call(key, upstream_stream)
+        try:
+            first = await anext(chunks, "")
+        except (DeadlineExceeded, RateLimited) as exc:
+            raise _upstream_error(exc)
+
+        async def body():
+            try:
+                yield first
+                async for chunk in chunks:
+                    yield chunk
+            finally:
+                await chunks.aclose()
+
+        return StreamingResponse(body(), media_type="text/plain")
+
+    async def upstream_call():
+        with track_upstream(backend, "completion"):
+            return await llm.complete(request.prompt)
+
+    try:
+        text = await get_llm_cache().get_or_call(
+            key,
+            lambda: scheduler.run(
+                upstream_call,
+                Priority.INTERACTIVE,
+                tokens,
+                timeout=settings.upstream_interactive_timeout,
+            ),
+        )
+    except (DeadlineExceeded, RateLimited) as exc:
+        raise _upstream_error(exc)
+    return {"completion": text}
+
+
 # Add your custom endpoints below
 # Example:
 # @app.post("/api/chat")
@@ -55,3 +242,12 @@ async def health_check():
 #     """Chat endpoint"""
 #     # Implementation here
 #     pass
+#
+# Cached + coalesced LLM call (see llm_cache.py):
+# @app.post("/api/review/stream")
+# async def review_stream(request: ReviewRequest):
+#     key = make_cache_key(DEFAULT_MODEL, request.prompt)
+#     return StreamingResponse(
+#         get_llm_cache().stream_or_call(key, lambda: stream_response(request.prompt)),
+#         media_type="text/plain"
+#     )
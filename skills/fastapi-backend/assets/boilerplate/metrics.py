@@ -0,0 +1,438 @@
+"""
+Lightweight request instrumentation with Prometheus text output
+
+Records per-route latency histograms, request/response sizes, an in-flight
+gauge and upstream (LLM) call durations. Everything is in-process and
+lock-protected counters only, so it is cheap enough to leave on in production.
+
+With several worker processes behind one port each scrape reaches a random
+worker, so workers publish `registry.snapshot()` to the shared cache server
+(`publish_metrics`) and `/metrics` serves `render_merged` over all of them.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional, Sequence
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def _header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+
+    @abstractmethod
+    def render(self) -> list[str]:
+        """Prometheus text lines for this metric, header included"""
+
+    @abstractmethod
+    def _export(self) -> list:
+        """[[label values, data], ...] as plain JSON values"""
+
+    @abstractmethod
+    def _merge(self, series: list, worker: str) -> None:
+        """Fold another worker's `_export()` into this metric"""
+
+    def snapshot(self) -> dict:
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "help": self.help_text,
+            "labels": list(self.label_names),
+            "series": self._export(),
+        }
+
+
+class _ValueMetric(_Metric):
+    """One number per label set (shared by Counter and Gauge)"""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        super().__init__(name, help_text, label_names)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = self._header()
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}")
+        return lines
+
+    def _export(self) -> list:
+        with self._lock:
+            return [[list(labels), value] for labels, value in self._values.items()]
+
+    def _merge(self, series: list, worker: str) -> None:
+        for labels, value in series:
+            self.inc(*labels, amount=value)
+
+
+class Counter(_ValueMetric):
+    """Monotonic counter"""
+
+    kind = "counter"
+
+
+class Gauge(_ValueMetric):
+    """Value that can go up and down
+
+    `aggregate` says how workers combine in `render_merged`: "sum" (in-flight
+    requests, queue depth), "max" (worst loop lag) or "worker" (one series
+    per worker, for ratios that cannot be added).
+    """
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        label_names: Sequence[str] = (),
+        aggregate: str = "sum",
+    ):
+        if aggregate not in ("sum", "max", "worker"):
+            raise ValueError(f"Unknown gauge aggregate: {aggregate!r}")
+        super().__init__(name, help_text, label_names)
+        self.aggregate = aggregate
+
+    def snapshot(self) -> dict:
+        return {**super().snapshot(), "aggregate": self.aggregate}
+
+    def _merge(self, series: list, worker: str) -> None:
+        if self.aggregate == "sum":
+            super()._merge(series, worker)
+            return
+        with self._lock:
+            for labels, value in series:
+                if self.aggregate == "worker":
+                    self._values[(*labels, worker)] = value
+                else:
+                    key = tuple(labels)
+                    self._values[key] = max(self._values.get(key, value), value)
+
+    def set(self, value: float, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def get(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram (buckets stored non-cumulative, cumulated on render)"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [bucket counts..., +Inf count, sum, count]
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = self._header()
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+        for labels, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}"
+                )
+            label_str = _format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{label_str} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{label_str} {series[-1]}")
+        return lines
+
+    def snapshot(self) -> dict:
+        return {**super().snapshot(), "buckets": list(self.buckets)}
+
+    def _export(self) -> list:
+        with self._lock:
+            return [[list(labels), list(series)] for labels, series in self._series.items()]
+
+    def _merge(self, series: list, worker: str) -> None:
+        with self._lock:
+            for labels, data in series:
+                merged = self._series.setdefault(tuple(labels), [0] * len(data))
+                for i, value in enumerate(data):
+                    merged[i] += value
+
+
+class MetricsRegistry:
+    """Holds metrics and renders them in Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: list[_Metric] = []
+        self._collectors: list[Callable[[], None]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help_text, label_names))
+
+    def gauge(
+        self,
+        name: str,
+        help_text: str,
+        label_names: Sequence[str] = (),
+        aggregate: str = "sum",
+    ) -> Gauge:
+        return self.register(Gauge(name, help_text, label_names, aggregate))
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, help_text, label_names, buckets))
+
+    def on_collect(self, callback: Callable[[], None]) -> None:
+        """Run ``callback`` before each scrape (to refresh gauges from other state)"""
+        self._collectors.append(callback)
+
+    def _collect(self) -> None:
+        for callback in self._collectors:
+            callback()
+
+    def render(self) -> str:
+        self._collect()
+        lines: list[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict:
+        """This process's metrics as JSON, for `render_merged` in another worker"""
+        self._collect()
+        return {
+            "worker": str(os.getpid()),
+            "time": time.time(),
+            "metrics": [metric.snapshot() for metric in self._metrics],
+        }
+
+
+def _from_snapshot(data: dict) -> _Metric:
+    if data["kind"] == "histogram":
+        return Histogram(data["name"], data["help"], data["labels"], data["buckets"])
+    if data["kind"] == "gauge":
+        aggregate = data.get("aggregate", "sum")
+        labels = data["labels"] + (["worker"] if aggregate == "worker" else [])
+        return Gauge(data["name"], data["help"], labels, aggregate)
+    return Counter(data["name"], data["help"], data["labels"])
+
+
+def render_merged(snapshots: list[dict[str, Any]], stale_after: float) -> str:
+    """Prometheus text for several workers' snapshots combined
+
+    Counters and histograms are summed, including those of workers that have
+    exited, so totals never go backwards. Gauges describe the present, so
+    snapshots older than `stale_after` seconds contribute none.
+    """
+    now = time.time()
+    merged: dict[str, _Metric] = {}
+    for snapshot in snapshots:
+        stale = now - snapshot["time"] > stale_after
+        for data in snapshot["metrics"]:
+            if stale and data["kind"] == "gauge":
+                continue
+            metric = merged.get(data["name"])
+            if metric is None:
+                metric = merged[data["name"]] = _from_snapshot(data)
+            metric._merge(data["series"], snapshot["worker"])
+    lines: list[str] = []
+    for metric in merged.values():
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+REQUEST_LATENCY = registry.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route",
+    ("method", "route", "status"),
+)
+REQUEST_SIZE = registry.histogram(
+    "http_request_size_bytes",
+    "HTTP request body size by route",
+    ("method", "route"),
+    SIZE_BUCKETS,
+)
+RESPONSE_SIZE = registry.histogram(
+    "http_response_size_bytes",
+    "HTTP response body size by route",
+    ("method", "route"),
+    SIZE_BUCKETS,
+)
+IN_FLIGHT = registry.gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being served",
+)
+UPSTREAM_LATENCY = registry.histogram(
+    "upstream_request_duration_seconds",
+    "Upstream (LLM provider) call duration",
+    ("provider", "operation", "outcome"),
+)
+EVENT_LOOP_LAG = registry.gauge(
+    "event_loop_lag_seconds",
+    "Most recent event loop scheduling delay",
+    aggregate="max",
+)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware (no per-request task or body buffering)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+        request_bytes = 0
+        response_bytes = 0
+
+        async def counting_receive():
+            nonlocal request_bytes
+            message = await receive()
+            if message["type"] == "http.request":
+                request_bytes += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            nonlocal status, response_bytes
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        # Trust Content-Length when present; only count chunked bodies
+        for name, value in scope["headers"]:
+            if name == b"content-length" and value.isdigit():
+                request_bytes = int(value)
+                wrapped_receive = receive
+                break
+        else:
+            wrapped_receive = counting_receive
+
+        IN_FLIGHT.inc()
+        try:
+            await self.app(scope, wrapped_receive, counting_send)
+        finally:
+            IN_FLIGHT.dec()
+            route = scope.get("route")
+            # Label by route template, not raw path, to keep cardinality bounded
+            route_path = getattr(route, "path", None) or UNMATCHED_ROUTE
+            method = scope["method"]
+            REQUEST_LATENCY.observe(time.perf_counter() - start, method, route_path, str(status))
+            REQUEST_SIZE.observe(request_bytes, method, route_path)
+            RESPONSE_SIZE.observe(response_bytes, method, route_path)
+
+
+@contextmanager
+def track_upstream(provider: str, operation: str = "completion") -> Iterator[None]:
+    """Time an upstream call: ``with track_upstream("openai"): ...``"""
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        UPSTREAM_LATENCY.observe(time.perf_counter() - start, provider, operation, outcome)
+
+
+async def monitor_event_loop_lag(interval: float = 0.5) -> None:
+    """Background task: measure how late the loop wakes us up"""
+    loop = asyncio.get_running_loop()
+    while True:
+        scheduled = loop.time() + interval
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.set(max(0.0, loop.time() - scheduled))
+
+
+async def publish_metrics(shared, interval: float) -> None:
+    """Background task: push this worker's snapshot to the shared cache server"""
+    while True:
+        snapshot = registry.snapshot()
+        await shared.publish(snapshot["worker"], snapshot)
+        await asyncio.sleep(interval)
+
+
+def thread_pool_usage() -> Optional[dict]:
+    """Saturation of the worker thread pool used for sync endpoints"""
+    try:
+        import anyio.to_thread
+
+        limiter = anyio.to_thread.current_default_thread_limiter()
+    except Exception:
+        return None
+    busy = limiter.borrowed_tokens
+    size = limiter.total_tokens
+    return {"busy": busy, "size": size, "saturation": round(busy / size, 4) if size else 0.0}
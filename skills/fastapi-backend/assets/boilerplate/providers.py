@@ -0,0 +1,118 @@
+"""
+Lazily constructed AI provider clients
+
+Provider SDKs (openai, google-generativeai, ...) each take hundreds of
+milliseconds to import. Importing them here, inside the getters, keeps that
+cost off process startup and pays it once, on the first request that needs it.
+
+Usage:
+    from providers import get_openai_client
+
+    client = get_openai_client()
+    stream = await client.chat.completions.create(...)
+"""
+
+from functools import lru_cache
+from typing import TYPE_CHECKING, AsyncIterator, Optional
+
+from constants import DEFAULT_MODEL, MAX_TOKENS, TEMPERATURE, get_settings
+from scheduler import RateLimited
+
+if TYPE_CHECKING:  # Type hints only; never imported at runtime
+    from openai import AsyncOpenAI
+
+
+@lru_cache(maxsize=1)
+def get_openai_client() -> "AsyncOpenAI":
+    """Shared async OpenAI client (requires `uv add openai`)"""
+    from openai import AsyncOpenAI
+
+    return AsyncOpenAI(api_key=get_settings().openai_api_key or None)
+
+
+@lru_cache(maxsize=1)
+def _gemini_module():
+    import google.generativeai as genai
+
+    genai.configure(api_key=get_settings().google_api_key)
+    return genai
+
+
+@lru_cache(maxsize=None)
+def get_gemini_model(model_name: str):
+    """Gemini model handle (requires `uv add google-generativeai`)"""
+    return _gemini_module().GenerativeModel(model_name)
+
+
+def warm_up(*providers: str) -> None:
+    """Import and build clients ahead of traffic (e.g. from a readiness hook)"""
+    for provider in providers:
+        if provider == "openai":
+            get_openai_client()
+        elif provider == "gemini":
+            _gemini_module()
+        else:
+            raise ValueError(f"Unknown provider: {provider}")
+
+
+class OpenAIText:
+    """Plain-text interface over the OpenAI SDK (same shape as fake_llm.FakeLLM)"""
+
+    def __init__(self, model: str = DEFAULT_MODEL):
+        self.model = model
+
+    def _request(self, prompt: str, max_tokens: int) -> dict:
+        return {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": max_tokens,
+            "temperature": TEMPERATURE,
+        }
+
+    @staticmethod
+    def _as_rate_limited(exc: Exception) -> Optional[RateLimited]:
+        import openai
+
+        if isinstance(exc, openai.RateLimitError):
+            retry_after = exc.response.headers.get("retry-after", "1")
+            return RateLimited(float(retry_after), str(exc))
+        return None
+
+    async def complete(self, prompt: str, max_tokens: int = MAX_TOKENS) -> str:
+        try:
+            response = await get_openai_client().chat.completions.create(
+                **self._request(prompt, max_tokens)
+            )
+        except Exception as exc:
+            rate_limited = self._as_rate_limited(exc)
+            if rate_limited is None:
+                raise
+            raise rate_limited from exc
+        return response.choices[0].message.content or ""
+
+    async def stream(self, prompt: str, max_tokens: int = MAX_TOKENS) -> AsyncIterator[str]:
+        try:
+            stream = await get_openai_client().chat.completions.create(
+                **self._request(prompt, max_tokens), stream=True
+            )
+        except Exception as exc:
+            rate_limited = self._as_rate_limited(exc)
+            if rate_limited is None:
+                raise
+            raise rate_limited from exc
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+@lru_cache(maxsize=1)
+def get_llm():
+    """Text LLM selected by LLM_BACKEND ("openai" or "fake" for tests/load tests)"""
+    settings = get_settings()
+    if settings.llm_backend == "fake":
+        from fake_llm import FakeLLM
+
+        return FakeLLM(latency=settings.fake_llm_latency)
+    if settings.llm_backend == "openai":
+        return OpenAIText()
+    raise ValueError(f"Unknown LLM_BACKEND: {settings.llm_backend}")
@@ -0,0 +1,410 @@
+"""
+Upstream concurrency scheduler for LLM providers
+
+Interactive and background work share one provider rate limit. Each provider
+gets token buckets for requests and tokens per minute, a concurrency cap and a
+priority queue: queued interactive calls always start before queued background
+calls, and background work can never take the slots reserved for interactive
+traffic. Calls that cannot start before their deadline are dropped instead of
+run late.
+
+Usage:
+    from scheduler import Priority, get_scheduler
+
+    scheduler = get_scheduler("openai")
+    async with scheduler.slot(Priority.INTERACTIVE, tokens=estimate_tokens(prompt)):
+        response = await client.chat.completions.create(...)
+
+    # Or with automatic retry on provider 429s:
+    text = await scheduler.run(lambda: generate(prompt), priority=Priority.BACKGROUND)
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import AsyncIterator, Awaitable, Callable, Optional, TypeVar
+
+from constants import MAX_TOKENS, get_settings
+from metrics import registry
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+QUEUE_WAIT = registry.histogram(
+    "upstream_queue_wait_seconds",
+    "Time spent queued before an upstream call could start",
+    ("provider", "priority"),
+)
+QUEUE_DEPTH = registry.gauge(
+    "upstream_queue_depth",
+    "Upstream calls waiting for a slot",
+    ("provider", "priority"),
+)
+DROPPED = registry.counter(
+    "upstream_dropped_total",
+    "Upstream calls dropped before starting",
+    ("provider", "priority", "reason"),
+)
+RATE_LIMITED = registry.counter(
+    "upstream_rate_limited_total",
+    "Rate-limit (429) responses received from providers",
+    ("provider",),
+)
+
+
+class Priority(IntEnum):
+    """Lower value is served first"""
+
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+class DeadlineExceeded(Exception):
+    """The call could not start before its deadline and was dropped"""
+
+
+class RateLimited(Exception):
+    """Raised by provider wrappers when the provider answers 429"""
+
+    def __init__(self, retry_after: float = 1.0, message: str = "rate limited"):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def estimate_tokens(prompt: str, max_tokens: int = MAX_TOKENS) -> int:
+    """Rough token cost of a call: ~4 characters per prompt token plus the output budget"""
+    return len(prompt) // 4 + max_tokens
+
+
+class TokenBucket:
+    """Continuously refilling bucket; `rate` units per second up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until(self, amount: float, now: float) -> float:
+        """Seconds until `amount` can be taken (requests larger than capacity wait for a full bucket)"""
+        self._refill(now)
+        needed = min(amount, self.capacity) - self.tokens
+        return 0.0 if needed <= 0 else needed / self.rate
+
+    def take(self, amount: float, now: float) -> None:
+        self._refill(now)
+        self.tokens -= amount
+
+    def adjust(self, delta: float) -> None:
+        """Correct an estimate after the fact (positive delta refunds, negative charges)"""
+        self.tokens = min(self.capacity, self.tokens + delta)
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    deadline: float
+    seq: int
+    tokens: int = field(compare=False)
+    enqueued_at: float = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+@dataclass
+class Grant:
+    """A started upstream call; report actual usage with `report_tokens`"""
+
+    scheduler: "ProviderScheduler"
+    priority: Priority
+    tokens: int
+    queue_wait: float
+    actual_tokens: Optional[int] = None
+
+    def report_tokens(self, actual_tokens: int) -> None:
+        self.actual_tokens = actual_tokens
+
+
+class ProviderScheduler:
+    """Rate limits, concurrency cap and priority queue for one provider"""
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        max_concurrency: int,
+        interactive_reserve: int = 0,
+        burst_seconds: float = 10.0,
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.interactive_reserve = min(interactive_reserve, max_concurrency - 1)
+        self.requests = TokenBucket(
+            requests_per_minute / 60, max(1.0, requests_per_minute / 60 * burst_seconds)
+        )
+        self.tokens = TokenBucket(
+            tokens_per_minute / 60, max(1.0, tokens_per_minute / 60 * burst_seconds)
+        )
+        self.active = {Priority.INTERACTIVE: 0, Priority.BACKGROUND: 0}
+        self.paused_until = 0.0
+        self._queue: list[_Waiter] = []
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    # -- public API ---------------------------------------------------------
+
+    async def acquire(
+        self,
+        priority: Priority = Priority.INTERACTIVE,
+        tokens: int = 0,
+        deadline: Optional[float] = None,
+    ) -> Grant:
+        """Wait for a slot; `deadline` is an absolute `time.monotonic()` value"""
+        self._ensure_dispatcher()
+        now = time.monotonic()
+        waiter = _Waiter(
+            priority=int(priority),
+            deadline=deadline if deadline is not None else float("inf"),
+            seq=next(self._seq),
+            tokens=tokens,
+            enqueued_at=now,
+            future=asyncio.get_running_loop().create_future(),
+        )
+        heapq.heappush(self._queue, waiter)
+        QUEUE_DEPTH.inc(self.name, priority.name.lower())
+        self._wakeup.set()
+        try:
+            return await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted just as the caller went away: give the slot back
+                self.release(waiter.future.result(), actual_tokens=0)
+            elif not waiter.future.done():
+                waiter.future.cancel()
+                self._wakeup.set()
+            raise
+
+    def release(self, grant: Grant, actual_tokens: Optional[int] = None) -> None:
+        """Free the concurrency slot and settle the token estimate"""
+        self.active[grant.priority] -= 1
+        actual = actual_tokens if actual_tokens is not None else grant.actual_tokens
+        if actual is not None:
+            self.tokens.adjust(grant.tokens - actual)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def backoff(self, retry_after: float) -> None:
+        """Pause all dispatching after a provider 429"""
+        RATE_LIMITED.inc(self.name)
+        self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+        # The provider has already counted this window; drain what we thought was left
+        self.requests.tokens = min(self.requests.tokens, 0.0)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        priority: Priority = Priority.INTERACTIVE,
+        tokens: int = 0,
+        timeout: Optional[float] = None,
+    ) -> AsyncIterator[Grant]:
+        """Hold a slot for the duration of the block; `timeout` is seconds from now"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        grant = await self.acquire(priority, tokens, deadline)
+        try:
+            yield grant
+        except RateLimited as exc:
+            self.backoff(exc.retry_after)
+            raise
+        finally:
+            self.release(grant)
+
+    async def run(
+        self,
+        call: Callable[[], Awaitable[T]],
+        priority: Priority = Priority.INTERACTIVE,
+        tokens: int = 0,
+        timeout: Optional[float] = None,
+        max_retries: int = 2,
+    ) -> T:
+        """Run `call` in a slot, re-queueing (same priority and deadline) on 429"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        for attempt in range(max_retries + 1):
+            grant = await self.acquire(priority, tokens, deadline)
+            try:
+                return await call()
+            except RateLimited as exc:
+                self.backoff(exc.retry_after)
+                if attempt == max_retries:
+                    raise
+            finally:
+                self.release(grant)
+        raise AssertionError("unreachable")
+
+    def queue_depth(self) -> dict:
+        depth = {p.name.lower(): 0 for p in Priority}
+        for waiter in self._queue:
+            if not waiter.future.done():
+                depth[Priority(waiter.priority).name.lower()] += 1
+        return depth
+
+    # -- dispatcher ---------------------------------------------------------
+
+    def _ensure_dispatcher(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._dispatcher is None or self._dispatcher.done() or self._dispatcher.get_loop() is not loop:
+            self._wakeup = asyncio.Event()
+            self._dispatcher = loop.create_task(self._dispatch())
+
+    def _drop(self, waiter: _Waiter, reason: str) -> None:
+        priority = Priority(waiter.priority).name.lower()
+        QUEUE_DEPTH.dec(self.name, priority)
+        if waiter.future.done():
+            return
+        DROPPED.inc(self.name, priority, reason)
+        waiter.future.set_exception(
+            DeadlineExceeded(f"{self.name}: {priority} call could not start before its deadline")
+        )
+
+    def _sweep(self, now: float) -> None:
+        """Remove cancelled waiters and drop expired ones anywhere in the queue"""
+        kept = []
+        for waiter in self._queue:
+            if waiter.future.cancelled():
+                QUEUE_DEPTH.dec(self.name, Priority(waiter.priority).name.lower())
+            elif waiter.deadline <= now:
+                self._drop(waiter, "deadline")
+            else:
+                kept.append(waiter)
+        if len(kept) != len(self._queue):
+            heapq.heapify(kept)
+            self._queue = kept
+
+    def _start_delay(self, waiter: _Waiter, now: float) -> Optional[float]:
+        """Seconds until `waiter` may start, or None if it must wait for a release"""
+        priority = Priority(waiter.priority)
+        in_use = sum(self.active.values())
+        if in_use >= self.max_concurrency:
+            return None
+        if priority is Priority.BACKGROUND and in_use >= self.max_concurrency - self.interactive_reserve:
+            return None
+        return max(
+            self.paused_until - now,
+            self.requests.time_until(1, now),
+            self.tokens.time_until(waiter.tokens, now),
+            0.0,
+        )
+
+    def _start(self, waiter: _Waiter, now: float) -> None:
+        heapq.heappop(self._queue)
+        priority = Priority(waiter.priority)
+        QUEUE_DEPTH.dec(self.name, priority.name.lower())
+        self.requests.take(1, now)
+        self.tokens.take(waiter.tokens, now)
+        self.active[priority] += 1
+        queue_wait = now - waiter.enqueued_at
+        QUEUE_WAIT.observe(queue_wait, self.name, priority.name.lower())
+        waiter.future.set_result(Grant(self, priority, waiter.tokens, queue_wait))
+
+    async def _dispatch(self) -> None:
+        while True:
+            now = time.monotonic()
+            self._sweep(now)
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            head = self._queue[0]
+            delay = self._start_delay(head, now)
+            if delay == 0.0:
+                self._start(head, now)
+                continue
+            if delay is not None and now + delay > head.deadline:
+                # Will not get a slot in time; fail fast instead of running late
+                heapq.heappop(self._queue)
+                self._drop(head, "deadline")
+                continue
+
+            timeout = delay
+            nearest_deadline = min(w.deadline for w in self._queue)
+            if nearest_deadline != float("inf"):
+                timeout = min(timeout if timeout is not None else float("inf"), nearest_deadline - now)
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+
+_schedulers: dict[str, ProviderScheduler] = {}
+
+
+def worker_limits(settings=None) -> dict:
+    """This worker's share of the deployment-wide UPSTREAM_* limits
+
+    Each of WEB_CONCURRENCY worker processes gets an equal share, and a
+    nonzero interactive reserve stays at least one slot per worker. Raises
+    ValueError when the concurrency cap cannot be split that way: rounding up
+    would exceed UPSTREAM_MAX_CONCURRENCY.
+    """
+    settings = settings or get_settings()
+    workers = max(1, settings.web_concurrency)
+    concurrency = settings.upstream_max_concurrency // workers
+    if concurrency < 1:
+        raise ValueError(
+            f"UPSTREAM_MAX_CONCURRENCY={settings.upstream_max_concurrency} cannot be split "
+            f"across {workers} workers; raise it or run fewer workers"
+        )
+    reserve = settings.upstream_interactive_reserve // workers
+    if settings.upstream_interactive_reserve > 0:
+        # Never let the split silently turn the interactive reservation off
+        reserve = max(1, reserve)
+        if concurrency < 2:
+            raise ValueError(
+                f"Each of {workers} workers gets 1 upstream slot, leaving none for background "
+                "work next to the interactive reserve; raise UPSTREAM_MAX_CONCURRENCY, run "
+                "fewer workers or set UPSTREAM_INTERACTIVE_RESERVE=0"
+            )
+        if reserve >= concurrency:
+            logger.warning(
+                "Interactive reserve per worker lowered from %d to %d so background work "
+                "keeps one of its %d upstream slots",
+                reserve, concurrency - 1, concurrency,
+            )
+            reserve = concurrency - 1
+    return {
+        "requests_per_minute": settings.upstream_requests_per_minute / workers,
+        "tokens_per_minute": settings.upstream_tokens_per_minute / workers,
+        "max_concurrency": concurrency,
+        "interactive_reserve": reserve,
+    }
+
+
+def get_scheduler(provider: str) -> ProviderScheduler:
+    """Shared scheduler per provider, built from settings on first use
+
+    Limits are for the whole deployment; see `worker_limits`.
+    """
+    scheduler = _schedulers.get(provider)
+    if scheduler is None:
+        scheduler = _schedulers[provider] = ProviderScheduler(provider, **worker_limits())
+    return scheduler
+
+
+def configure_scheduler(provider: str, **limits) -> ProviderScheduler:
+    """Replace a provider's scheduler with explicit limits (see ProviderScheduler)"""
+    _schedulers[provider] = ProviderScheduler(provider, **limits)
+    return _schedulers[provider]
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Production server: multi-process uvicorn workers plus a shared cache process
+
+Workers are independent processes, so each gets its own event loop and uses
+its own core. The cache server (shared_cache.py) lets them reuse each other's
+computed results (reviews, profiles) instead of each recomputing them cold.
+
+Usage:
+    uv run python serve.py                       # one worker per available core (cgroup quota aware)
+    uv run python serve.py --workers 4 --port 8000
+    WEB_CONCURRENCY=8 uv run python serve.py
+"""
+
+import argparse
+import logging
+import math
+import multiprocessing
+import os
+import signal
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+import uvicorn
+
+from constants import get_settings
+from scheduler import worker_limits
+from shared_cache import run_server
+
+logger = logging.getLogger(__name__)
+
+
+def cgroup_cpu_limit() -> Optional[int]:
+    """CPUs allowed by the container's CFS quota (cgroup v2, then v1), None if unlimited
+
+    `sched_getaffinity` reports the host's cores, so a container limited to 2
+    CPUs on a 64-core node would otherwise start 64 workers.
+    """
+    try:
+        quota, period = Path("/sys/fs/cgroup/cpu.max").read_text().split()[:2]
+    except (OSError, ValueError):
+        try:
+            quota = Path("/sys/fs/cgroup/cpu/cpu.cfs_quota_us").read_text().strip()
+            period = Path("/sys/fs/cgroup/cpu/cpu.cfs_period_us").read_text().strip()
+        except OSError:
+            return None
+    if quota in ("max", "-1"):
+        return None
+    try:
+        return max(1, math.ceil(int(quota) / int(period)))
+    except (ValueError, ZeroDivisionError):
+        return None
+
+
+def available_cores() -> int:
+    """Cores this process may run on, capped by the cgroup CPU quota"""
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:  # macOS / Windows
+        cores = os.cpu_count() or 1
+    limit = cgroup_cpu_limit()
+    return max(1, min(cores, limit) if limit is not None else cores)
+
+
+def default_workers() -> int:
+    """WEB_CONCURRENCY, else one worker per available core
+
+    Endpoints are async and mostly wait on upstream LLM calls, so one worker
+    per core saturates the CPU; the 2n+1 rule for sync servers only adds
+    memory and cold caches. The core count is lowered until `worker_limits`
+    can split UPSTREAM_MAX_CONCURRENCY across the workers; an explicit
+    WEB_CONCURRENCY is returned as is and validated by the caller.
+    """
+    settings = get_settings()
+    if "web_concurrency" in settings.model_fields_set:
+        return max(1, settings.web_concurrency)
+    cores = available_cores()
+    for workers in range(cores, 1, -1):
+        try:
+            worker_limits(settings.model_copy(update={"web_concurrency": workers}))
+        except ValueError:
+            continue
+        if workers < cores:
+            logger.warning(
+                "Starting %d workers instead of %d: UPSTREAM_MAX_CONCURRENCY=%d cannot be "
+                "split further", workers, cores, settings.upstream_max_concurrency,
+            )
+        return workers
+    return 1
+
+
+def start_cache_server(path: str, timeout: float = 10.0) -> multiprocessing.Process:
+    settings = get_settings()
+    process = multiprocessing.Process(
+        target=run_server,
+        args=(path, settings.llm_cache_ttl_seconds, settings.llm_cache_max_entries * 8),
+        name="shared-cache",
+        daemon=True,
+    )
+    process.start()
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(path):
+        if not process.is_alive() or time.monotonic() > deadline:
+            raise RuntimeError(f"Shared cache server did not start at {path}")
+        time.sleep(0.01)
+    return process
+
+
+def stop_cache_server(process: multiprocessing.Process, path: str) -> None:
+    process.terminate()
+    process.join(timeout=5)
+    if process.is_alive():
+        process.kill()
+        process.join()
+    if os.path.exists(path):
+        os.unlink(path)
+
+
+def _exit_on_signal(signum, frame) -> None:
+    # uvicorn re-raises the shutdown signal once it has stopped; turn it into
+    # SystemExit so the cache server is cleaned up instead of orphaned
+    raise SystemExit(128 + signum)
+
+
+def main() -> int:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Run the app with multiple workers and a shared cache.")
+    parser.add_argument(
+        "--workers", type=int, help="Worker processes (default: WEB_CONCURRENCY, else one per core)"
+    )
+    parser.add_argument("--host", default=settings.host)
+    parser.add_argument("--port", type=int, default=settings.port)
+    parser.add_argument(
+        "--cache-socket",
+        default=str(Path(tempfile.gettempdir()) / f"app-cache-{os.getpid()}.sock"),
+        help="Unix socket for the shared cache",
+    )
+    parser.add_argument("--no-shared-cache", action="store_true", help="Workers keep private caches only")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+    if args.workers is None:
+        args.workers = default_workers()
+
+    try:
+        worker_limits(settings.model_copy(update={"web_concurrency": args.workers}))
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    # Workers inherit the environment: tell them how many siblings share the
+    # upstream rate limits and where the shared cache lives
+    os.environ["WEB_CONCURRENCY"] = str(args.workers)
+    cache_process = None
+    if not args.no_shared_cache:
+        cache_process = start_cache_server(args.cache_socket)
+        os.environ["SHARED_CACHE_SOCKET"] = args.cache_socket
+    # Only after the cache server has started: a forked child would inherit
+    # the handler and exit mid-request instead of shutting down on its own
+    signal.signal(signal.SIGTERM, _exit_on_signal)
+
+    try:
+        uvicorn.run(
+            "main:app",
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            log_level=args.log_level,
+            access_log=False,
+            proxy_headers=True,
+            timeout_keep_alive=30,
+            backlog=4096,
+        )
+    finally:
+        if cache_process is not None:
+            stop_cache_server(cache_process, args.cache_socket)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
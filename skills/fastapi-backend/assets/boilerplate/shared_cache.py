@@ -0,0 +1,197 @@
+"""
+Cross-process cache over a local Unix socket
+
+With several uvicorn workers each process has its own memory, so every worker
+would recompute the same reviews and profiles. `serve.py` starts one cache
+server process next to the workers; each worker talks to it through
+`SharedCacheClient` (set SHARED_CACHE_SOCKET to enable).
+
+Frames are a 4-byte big-endian length followed by a JSON object:
+    {"op": "get", "key": k}                      -> {"value": v | null}
+    {"op": "set", "key": k, "value": v}          -> {"ok": true}
+    {"op": "stats"}                              -> {"entries": n, "hits": h, "misses": m}
+    {"op": "publish", "worker": w, "value": v}   -> {"ok": true}
+    {"op": "collect"}                            -> {"values": [v, ...]}
+
+`publish`/`collect` keep the latest metrics snapshot per worker (see
+metrics.render_merged) outside the TTL cache, so they are never evicted.
+
+The client fails open: if the server is unreachable, `get` returns None and
+`set` is dropped, so workers keep serving with their local caches.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import signal
+import struct
+from functools import lru_cache
+from typing import Any, Optional
+
+from constants import get_settings
+from llm_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct(">I")
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> Optional[dict]:
+    try:
+        header = await reader.readexactly(_HEADER.size)
+    except asyncio.IncompleteReadError:
+        return None
+    (size,) = _HEADER.unpack(header)
+    if size > MAX_FRAME_BYTES:
+        raise ValueError(f"Frame of {size} bytes exceeds limit")
+    return json.loads(await reader.readexactly(size))
+
+
+def _write_frame(writer: asyncio.StreamWriter, message: dict) -> None:
+    payload = json.dumps(message).encode("utf-8")
+    writer.write(_HEADER.pack(len(payload)) + payload)
+
+
+class SharedCacheServer:
+    """Single-process TTL + LRU store answering cache requests from workers"""
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.entries = TTLCache(ttl_seconds, max_entries)
+        self.hits = 0
+        self.misses = 0
+        self.published: dict[str, Any] = {}
+        self._connections: dict[asyncio.Task, asyncio.StreamWriter] = {}
+
+    def handle(self, request: dict) -> dict:
+        op = request.get("op")
+        if op == "get":
+            value = self.entries.get(request["key"])
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return {"value": value}
+        if op == "set":
+            self.entries.set(request["key"], request["value"])
+            return {"ok": True}
+        if op == "stats":
+            return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
+        if op == "publish":
+            self.published[request["worker"]] = request["value"]
+            return {"ok": True}
+        if op == "collect":
+            return {"values": list(self.published.values())}
+        return {"error": f"unknown op: {op}"}
+
+    async def _serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        task = asyncio.current_task()
+        self._connections[task] = writer
+        try:
+            while True:
+                request = await _read_frame(reader)
+                if request is None:
+                    break
+                _write_frame(writer, self.handle(request))
+                await writer.drain()
+        except (ConnectionError, ValueError) as exc:
+            logger.warning("Shared cache connection closed: %s", exc)
+        finally:
+            self._connections.pop(task, None)
+            writer.close()
+
+    async def serve(self, path: str) -> None:
+        """Serve until SIGTERM/SIGINT, then close client connections and return"""
+        if os.path.exists(path):
+            os.unlink(path)
+        server = await asyncio.start_unix_server(self._serve_connection, path=path)
+        os.chmod(path, 0o600)
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(signum, stop.set)
+        async with server:
+            await stop.wait()
+            server.close()
+            # Workers hold persistent connections: close them and let each
+            # handler see EOF, rather than having asyncio.run cancel it
+            handlers = list(self._connections)
+            for writer in self._connections.values():
+                writer.close()
+            await asyncio.gather(*handlers, return_exceptions=True)
+
+
+def run_server(path: str, ttl_seconds: float, max_entries: int) -> None:
+    """Process entry point used by serve.py"""
+    try:
+        asyncio.run(SharedCacheServer(ttl_seconds, max_entries).serve(path))
+    except KeyboardInterrupt:
+        pass
+
+
+class SharedCacheClient:
+    """Async client with a small pool of persistent connections"""
+
+    def __init__(self, path: str, pool_size: int = 8, timeout: float = 0.5):
+        self.path = path
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._idle: list[tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._warned = False
+
+    async def _request(self, message: dict) -> Optional[dict]:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.pool_size)
+        async with self._slots:
+            conn = self._idle.pop() if self._idle else None
+            response = None
+            try:
+                if conn is None:
+                    conn = await asyncio.wait_for(
+                        asyncio.open_unix_connection(self.path), self.timeout
+                    )
+                reader, writer = conn
+                _write_frame(writer, message)
+                await writer.drain()
+                response = await asyncio.wait_for(_read_frame(reader), self.timeout)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as exc:
+                if not self._warned:
+                    logger.warning("Shared cache at %s unavailable: %s", self.path, exc)
+                    self._warned = True
+                return None
+            finally:
+                # Only a connection that completed a request/response is reusable;
+                # errors, cancellation and server EOF leave it in an unknown state
+                if conn is not None:
+                    if response is None:
+                        conn[1].close()
+                    else:
+                        self._idle.append(conn)
+            return response
+
+    async def get(self, key: str) -> Optional[Any]:
+        response = await self._request({"op": "get", "key": key})
+        return response.get("value") if response else None
+
+    async def set(self, key: str, value: Any) -> None:
+        await self._request({"op": "set", "key": key, "value": value})
+
+    async def stats(self) -> Optional[dict]:
+        return await self._request({"op": "stats"})
+
+    async def publish(self, worker: str, value: Any) -> None:
+        await self._request({"op": "publish", "worker": worker, "value": value})
+
+    async def collect(self) -> Optional[list]:
+        """Every worker's published value, or None if the server is unreachable"""
+        response = await self._request({"op": "collect"})
+        return response.get("values") if response else None
+
+
+@lru_cache(maxsize=1)
+def get_shared_cache() -> Optional[SharedCacheClient]:
+    """Client for the cache server started by serve.py, or None when not configured"""
+    path = get_settings().shared_cache_socket
+    return SharedCacheClient(path) if path else None
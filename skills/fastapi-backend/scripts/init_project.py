@@ -3,13 +3,22 @@
 Initialize a new FastAPI project with uv
 """
 
-import os
+import argparse
 import shutil
-import sys
 from pathlib import Path
 
 
-def init_project(project_name: str, target_dir: str = "."):
+PRODUCTION_FILES = [
+    "serve.py",
+    "loadtest/compare_workers.py"
+]
+
+
+def init_project(
+    project_name: str,
+    target_dir: str = ".",
+    profile: str = "dev",
+):
     """Initialize a new FastAPI project"""
     
     # Get the skill directory (parent of scripts/)
@@ -28,7 +37,14 @@ def init_project(project_name: str, target_dir: str = "."):
         "main.py",
         "pyproject.toml",
         ".env.example",
-        "constants.py"
+        "constants.py",
+        "llm_cache.py",
+        "metrics.py",
+        "providers.py",
+        "scheduler.py",
+        "fake_llm.py",
+        "shared_cache.py",
+        "bench_startup.py"
     ]
     
     for file_name in files_to_copy:
@@ -43,6 +59,21 @@ def init_project(project_name: str, target_dir: str = "."):
     # Create additional directories
     (project_path / "tests").mkdir(exist_ok=True)
     print("✅ Created tests/")
+
+    # Load-testing harness (load generator, request mixes, baseline)
+    shutil.copytree(
+        boilerplate_dir / "loadtest",
+        project_path / "loadtest",
+        ignore=shutil.ignore_patterns("compare_workers.py"),
+        dirs_exist_ok=True,
+    )
+    print("✅ Created loadtest/")
+
+    # Production serving profile (multi-worker server + worker comparison)
+    if profile == "production":
+        for file_name in PRODUCTION_FILES:
+            shutil.copy2(boilerplate_dir / file_name, project_path / file_name)
+            print(f"✅ Created {file_name}")
     
     # Create .gitignore
     gitignore_content = """# Python
@@ -82,6 +113,28 @@ Thumbs.db
     print("✅ Created .gitignore")
     
     # Create README
+    production_readme = """## Production serving
+
+`serve.py` runs one uvicorn worker per available core (override with
+`--workers` or `WEB_CONCURRENCY`) plus a shared cache process. Workers reuse
+each other's cached LLM results through a local Unix socket
+(`shared_cache.py`) instead of each computing them again, and split the
+upstream rate limits (`UPSTREAM_*`) between them.
+
+```bash
+uv run python serve.py --port 8000
+```
+
+Compare single-worker and multi-worker throughput:
+```bash
+uv run python loadtest/compare_workers.py --suite llm
+```
+
+`/metrics` merges all workers through the shared cache process (other workers'
+numbers are up to 5 s old). With `--no-shared-cache` and several workers it
+returns 503, since each scrape would reach a random worker.
+
+"""
     readme_content = f"""# {project_name}
 
 FastAPI backend built with uv
@@ -107,7 +160,38 @@ uv run uvicorn main:app --reload --port 8000
 - API: http://localhost:8000
 - Docs: http://localhost:8000/docs
 
-## Testing
+## Startup performance
+
+Settings are built on first use (`constants.get_settings()`) and provider SDKs
+are imported lazily in `providers.py`. Keep heavy imports out of module scope.
+
+Measure import time per module and time to first successful request:
+```bash
+uv run python bench_startup.py
+```
+
+Precompile bytecode with the project's interpreter for faster cold starts
+(run it in the image/venv build step, after `uv sync`):
+```bash
+uv run python -m compileall -q .
+```
+
+## Load testing
+
+`loadtest/loadgen.py` drives the request mixes in `loadtest/scenarios.json`
+against a local server using the fake LLM backend (no API keys needed) and
+reports p50/p95/p99 latency and RPS per scenario.
+
+Record a baseline once, then check later changes against it:
+```bash
+uv run python loadtest/loadgen.py --save-baseline
+uv run python loadtest/loadgen.py --compare   # exits 1 on >20% regression
+```
+
+Commit `loadtest/baseline.json`. Re-record it when the hardware or the
+request mix changes.
+
+{production_readme if profile == "production" else ""}## Testing
 
 Run tests:
 ```bash
@@ -121,6 +205,7 @@ uv run pytest --cov=. --cov-report=html
 """
     (project_path / "README.md").write_text(readme_content)
     print("✅ Created README.md")
+
     
     print(f"\n✨ Project '{project_name}' initialized successfully!")
     print(f"\nNext steps:")
@@ -129,14 +214,24 @@ uv run pytest --cov=. --cov-report=html
     print(f"3. Edit .env with your API keys")
     print(f"4. uv sync")
     print(f"5. uv run uvicorn main:app --reload")
+    if profile == "production":
+        print(f"   Production: uv run python serve.py")
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python init_project.py <project_name> [target_directory]")
-        sys.exit(1)
-    
-    project_name = sys.argv[1]
-    target_dir = sys.argv[2] if len(sys.argv) > 2 else "."
-    
-    init_project(project_name, target_dir)
+    parser = argparse.ArgumentParser(description="Initialize a new FastAPI project with uv")
+    parser.add_argument("project_name")
+    parser.add_argument("target_dir", nargs="?", default=".")
+    parser.add_argument(
+        "--profile",
+        choices=["dev", "production"],
+        default="dev",
+        help="'production' adds serve.py (multi-worker + shared cache) and a worker benchmark",
+    )
+    args = parser.parse_args()
+
+    init_project(
+        args.project_name,
+        args.target_dir,
+        profile=args.profile,
+    )
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+
+import argparse
+import heapq
+import time
+from array import array
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from taste_profile import _as_list, _decade, _norm_token, _read_json, _write_json
+
+# How much each signal family contributes once normalized to [-1, 1].
+FIELD_WEIGHTS = {
+    "genres": 1.0,
+    "tags": 0.8,
+    "directors": 0.6,
+    "decades": 0.5,
+}
+FIELD_PREFIX = {
+    "genres": "genre",
+    "tags": "tag",
+    "directors": "director",
+    "decades": "era",
+}
+
+# Quiz axes (movie-taste-binary-quiz) mapped onto catalog features.
+AXIS_FEATURES: Dict[str, Dict[str, float]] = {
+    "BLOCKBUSTER": {"genre:action": 1.0, "genre:adventure": 1.0, "genre:superhero": 1.0},
+    "FANTASY_SF": {"genre:sci-fi": 1.0, "genre:science fiction": 1.0, "genre:fantasy": 1.0},
+    "HORROR_THRILLER": {"genre:horror": 1.0, "genre:thriller": 1.0},
+    "DARK_INTENSE": {"genre:crime": 0.7, "genre:thriller": 0.5, "genre:war": 0.7, "genre:drama": 0.3},
+    "COMFORT_LIGHT": {
+        "genre:comedy": 1.0,
+        "genre:family": 1.0,
+        "genre:animation": 0.8,
+        "genre:romance": 0.7,
+        "genre:musical": 0.7,
+    },
+    "IRONIC_STYLIZED": {"genre:crime": 0.5, "genre:comedy": 0.5, "genre:neo-noir": 1.0},
+    "CANON_CLASSIC": {"critic": 0.6, "era:1970s": 0.5, "era:1980s": 0.4, "era:1990s": 0.3},
+}
+QUIZ_WEIGHT = 0.5
+AXIS_SCALE = 3.0  # A quiz axis rarely exceeds +/-3 over the core 10 questions.
+CRITIC_WEIGHT = 0.2  # Quality prior so ties break toward better-reviewed movies.
+
+
+@dataclass(frozen=True)
+class Scored:
+    index: int
+    score: float
+
+
+class CatalogIndex:
+    """Sparse movie x feature matrix, built once per catalog.
+
+    Rows are stored CSR-style (indptr/indices/data) for explanations, and the
+    transpose as per-feature postings so scoring a user touches only the
+    features that user actually has a weight for.
+    """
+
+    def __init__(self, movies: List[Dict[str, Any]]):
+        self.movies = movies
+        self.feature_ids: Dict[str, int] = {}
+        self.feature_names: List[str] = []
+        self.indptr = array("l", [0])
+        self.indices = array("l")
+        self.data = array("d")
+
+        for movie in movies:
+            for feature, value in _movie_features(movie):
+                fid = self.feature_ids.get(feature)
+                if fid is None:
+                    fid = len(self.feature_names)
+                    self.feature_ids[feature] = fid
+                    self.feature_names.append(feature)
+                self.indices.append(fid)
+                self.data.append(value)
+            self.indptr.append(len(self.indices))
+
+        postings: List[Tuple[array, array]] = [
+            (array("l"), array("d")) for _ in self.feature_names
+        ]
+        for row in range(len(movies)):
+            for k in range(self.indptr[row], self.indptr[row + 1]):
+                rows, values = postings[self.indices[k]]
+                rows.append(row)
+                values.append(self.data[k])
+        self.postings = postings
+        # --exclude accepts either a slug or a title; titles can repeat (remakes)
+        self.slug_index: Dict[str, List[int]] = {}
+        for i, movie in enumerate(movies):
+            for key in _movie_keys(movie):
+                rows = self.slug_index.setdefault(key, [])
+                if not rows or rows[-1] != i:
+                    rows.append(i)
+
+    def score(self, weights: Dict[str, float]) -> List[float]:
+        scores = [0.0] * len(self.movies)
+        for feature, weight in weights.items():
+            fid = self.feature_ids.get(feature)
+            if fid is None or weight == 0:
+                continue
+            rows, values = self.postings[fid]
+            for row, value in zip(rows, values):
+                scores[row] += weight * value
+        return scores
+
+    def top_k(
+        self,
+        weights: Dict[str, float],
+        k: int,
+        exclude: Iterable[str] = (),
+    ) -> List[Scored]:
+        scores = self.score(weights)
+        for key in exclude:
+            for row in self.slug_index.get(_norm_token(key) or "", []):
+                scores[row] = float("-inf")
+        best = heapq.nlargest(k, range(len(scores)), key=scores.__getitem__)
+        return [Scored(i, scores[i]) for i in best if scores[i] != float("-inf")]
+
+    def explain(self, row: int, weights: Dict[str, float], n: int = 3) -> List[str]:
+        parts: List[Tuple[float, str]] = []
+        for k in range(self.indptr[row], self.indptr[row + 1]):
+            feature = self.feature_names[self.indices[k]]
+            contribution = weights.get(feature, 0.0) * self.data[k]
+            if contribution:
+                parts.append((contribution, feature))
+        parts.sort(key=lambda p: abs(p[0]), reverse=True)
+        return [f"{feature} ({value:+.2f})" for value, feature in parts[:n]]
+
+
+def _movie_keys(movie: Dict[str, Any]) -> List[str]:
+    keys = [_norm_token(movie.get("slug")), _norm_token(movie.get("title"))]
+    return [k for k in keys if k]
+
+
+def _movie_features(movie: Dict[str, Any]) -> List[Tuple[str, float]]:
+    features: Dict[str, float] = {}
+    for field, prefix in [("genres", "genre"), ("tags", "tag"), ("directors", "director")]:
+        for raw in _as_list(movie.get(field)):
+            token = _norm_token(raw)
+            if token:
+                features[f"{prefix}:{token}"] = 1.0
+    decade = _decade(movie.get("year"))
+    if decade:
+        features[f"era:{decade}"] = 1.0
+    critic = movie.get("criticScore", movie.get("critic_score"))
+    if isinstance(critic, (int, float)) and 0 <= critic <= 100:
+        # Centered so an average movie neither gains nor loses score.
+        features["critic"] = (float(critic) - 50.0) / 50.0
+    return list(features.items())
+
+
+def weights_from_signals(signals: Dict[str, Any]) -> Dict[str, float]:
+    weights: Dict[str, float] = {}
+    for field, field_weight in FIELD_WEIGHTS.items():
+        entries = signals.get(field, {}).get("delta_top", [])
+        # taste_profile.py reports integer counts, signal_engine.py decayed weights.
+        counts = [(e.get("key"), float(e.get("weight", e.get("count", 0)))) for e in entries]
+        counts = [(k, c) for k, c in counts if k and c]
+        if not counts:
+            continue
+        scale = max(abs(c) for _, c in counts)
+        for key, count in counts:
+            token = _norm_token(key)
+            if token:
+                feature = f"{FIELD_PREFIX[field]}:{token}"
+                weights[feature] = weights.get(feature, 0.0) + field_weight * count / scale
+    return weights
+
+
+def weights_from_axes(axes: Dict[str, Any]) -> Dict[str, float]:
+    weights: Dict[str, float] = {}
+    for axis, value in axes.items():
+        try:
+            strength = max(-1.0, min(1.0, float(value) / AXIS_SCALE))
+        except Exception:
+            continue
+        for feature, share in AXIS_FEATURES.get(axis, {}).items():
+            weights[feature] = weights.get(feature, 0.0) + QUIZ_WEIGHT * strength * share
+    return weights
+
+
+def _axes_from_quiz(quiz: Dict[str, Any]) -> Dict[str, Any]:
+    if isinstance(quiz.get("axes"), dict):
+        return quiz["axes"]
+    handoff = quiz.get("quiz_handoff", quiz)
+    axes: Dict[str, float] = {}
+    for axis in _as_list(handoff.get("top_axes")):
+        axes[axis] = AXIS_SCALE * 2 / 3
+    for axis in _as_list(handoff.get("bottom_axes")):
+        axes[axis] = -AXIS_SCALE * 2 / 3
+    return axes
+
+
+def build_weights(
+    profile: Optional[Dict[str, Any]] = None,
+    quiz: Optional[Dict[str, Any]] = None,
+) -> Dict[str, float]:
+    weights: Dict[str, float] = {"critic": CRITIC_WEIGHT}
+    parts: List[Dict[str, float]] = []
+    if profile:
+        parts.append(weights_from_signals(profile.get("signals", profile)))
+        if not quiz and profile.get("quiz_handoff"):
+            quiz = profile["quiz_handoff"]
+    if quiz:
+        parts.append(weights_from_axes(_axes_from_quiz(quiz)))
+    for part in parts:
+        for feature, w in part.items():
+            weights[feature] = weights.get(feature, 0.0) + w
+    return weights
+
+
+def _load_catalog(data: Any) -> List[Dict[str, Any]]:
+    if isinstance(data, dict):
+        data = data.get("movies", data.get("catalog", []))
+    return [m for m in _as_list(data) if isinstance(m, dict)]
+
+
+def _load_users(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    if args.users:
+        data = _read_json(args.users)
+        users = data.get("users", data) if isinstance(data, dict) else data
+        return [u for u in _as_list(users) if isinstance(u, dict)]
+    user: Dict[str, Any] = {"id": "user"}
+    if args.profile:
+        user["profile"] = _read_json(args.profile)
+    if args.quiz:
+        user["quiz"] = _read_json(args.quiz)
+    return [user]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Rank catalog movies against taste profiles (single user or batch)."
+    )
+    parser.add_argument("--catalog", required=True, help="Catalog JSON: list of movies or {movies: [...]}.")
+    parser.add_argument("--profile", help="taste_profile.py output for one user.")
+    parser.add_argument("--quiz", help="score_quiz.py output for one user.")
+    parser.add_argument(
+        "--users",
+        help="Batch JSON: [{id, profile?, quiz?, exclude?}, ...]. Overrides --profile/--quiz.",
+    )
+    parser.add_argument("--exclude", action="append", default=[], help="Slug/title to skip (repeatable).")
+    parser.add_argument("--top", type=int, default=10, help="How many movies per user.")
+    parser.add_argument("--output", required=True, help="Path to output JSON (use '-' for stdout).")
+    args = parser.parse_args()
+
+    if not (args.users or args.profile or args.quiz):
+        parser.error("provide --profile and/or --quiz, or --users for batch scoring")
+
+    started = time.perf_counter()
+    index = CatalogIndex(_load_catalog(_read_json(args.catalog)))
+    built = time.perf_counter()
+
+    results = []
+    for user in _load_users(args):
+        weights = build_weights(user.get("profile"), user.get("quiz"))
+        exclude = list(args.exclude) + [str(x) for x in _as_list(user.get("exclude"))]
+        top = index.top_k(weights, args.top, exclude)
+        results.append({
+            "id": user.get("id"),
+            "top": [
+                {
+                    "slug": index.movies[s.index].get("slug"),
+                    "title": index.movies[s.index].get("title"),
+                    "score": round(s.score, 4),
+                    "because": index.explain(s.index, weights),
+                }
+                for s in top
+            ],
+        })
+    scored = time.perf_counter()
+
+    output = {
+        "results": results,
+        "stats": {
+            "movies": len(index.movies),
+            "features": len(index.feature_names),
+            "nonzeros": len(index.data),
+            "users": len(results),
+            "index_ms": round((built - started) * 1000, 2),
+            "scoring_ms": round((scored - built) * 1000, 2),
+        },
+        "notes": (
+            "score is a weighted sum of delta_top signals, quiz axes and a small critic-score prior; "
+            "use it to shortlist candidates for the LLM, not as a final recommendation."
+        ),
+    }
+    _write_json(args.output, output)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
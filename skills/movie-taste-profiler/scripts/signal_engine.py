@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import math
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from taste_profile import _movie_tokens, _norm_token, _normalize_movies, _read_json, _write_json
+
+DAY = 86400.0
+# Half-lives (days) that can be queried; "no decay" is always tracked as well.
+DEFAULT_HALF_LIVES = [7.0, 14.0, 30.0, 60.0, 90.0, 180.0, 365.0, 730.0, 1825.0, 3650.0]
+# Rebase a decay rate once its growth factor reaches e^REBASE_AT, well before
+# float overflow (~e^709).
+REBASE_AT = 500.0
+# Cap on the growth factor when querying a time before the reference point, so
+# stored sums (at most ~e^REBASE_AT each) cannot overflow.
+MAX_QUERY_EXP = 700.0 - REBASE_AT - 50.0
+# Ingested ratings remembered so replaying an input does not count it twice;
+# past this, the oldest quarter is forgotten (see SignalEngine.mark_seen).
+MAX_SEEN = 100_000
+
+FIELDS = {
+    "genres": "genre",
+    "directors": "director",
+    "tags": "tag",
+    "decades": "era",
+}
+
+
+def rating_weight(rating: Any) -> Optional[float]:
+    """Map a 1-10 rating onto [-1, 1]: 1 -> -1, 5.5 -> 0, 10 -> +1."""
+    try:
+        value = float(rating)
+    except Exception:
+        return None
+    if not 1 <= value <= 10:
+        return None
+    return (value - 5.5) / 4.5
+
+
+def parse_timestamp(value: Any) -> Optional[float]:
+    """Epoch seconds from epoch seconds/milliseconds or an ISO 8601 string."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value) / 1000.0 if value > 1e11 else float(value)
+    if isinstance(value, str) and value.strip():
+        try:
+            parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+        except ValueError:
+            return None
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+    return None
+
+
+def _movie_time(movie: Dict[str, Any]) -> Optional[float]:
+    for field in ("ratedAt", "rated_at", "timestamp", "date"):
+        ts = parse_timestamp(movie.get(field))
+        if ts is not None:
+            return ts
+    return None
+
+
+class SignalEngine:
+    """Per-token exponentially decayed like/dislike sums.
+
+    For each tracked decay rate r = ln 2 / half_life the engine stores
+    sum(w * e^(r * (t - ref))) instead of the decayed value, so a new rating
+    is one multiply-add per token and rate, whatever its timestamp. The value
+    at time `now` is the stored sum times e^(-r * (now - ref)). Likes and
+    dislikes are kept apart so both stay non-negative.
+    """
+
+    def __init__(self, half_lives_days: Sequence[float] = DEFAULT_HALF_LIVES):
+        self.half_lives = sorted({float(h) for h in half_lives_days if h > 0}, reverse=True)
+        # Rate 0 (no decay) first, then increasing rates.
+        self.rates = [0.0] + [math.log(2) / (h * DAY) for h in self.half_lives]
+        self.refs: List[Optional[float]] = [None] * len(self.rates)
+        self.likes: Dict[str, List[float]] = {}
+        self.dislikes: Dict[str, List[float]] = {}
+        self.events = 0
+        self.latest: Optional[float] = None
+        # Rating key -> timestamp it was ingested at
+        self.seen: Dict[str, float] = {}
+        # Dated ratings at or before this time were forgotten from `seen`
+        self.seen_until: Optional[float] = None
+
+    def mark_seen(self, key: str, timestamp: float, dated: bool = True) -> bool:
+        """Remember a rating; False if it was already ingested.
+
+        Past MAX_SEEN keys the oldest quarter is dropped and their newest
+        timestamp kept, so a replayed dated rating from before it still counts
+        as seen. Undated ratings are keyed by movie alone.
+        """
+        if key in self.seen:
+            return False
+        if dated and self.seen_until is not None and timestamp <= self.seen_until:
+            return False
+        self.seen[key] = timestamp
+        if len(self.seen) > MAX_SEEN:
+            oldest = sorted(self.seen.items(), key=lambda kv: kv[1])[: MAX_SEEN // 4]
+            for old_key, _ in oldest:
+                del self.seen[old_key]
+            forgotten = oldest[-1][1]
+            self.seen_until = forgotten if self.seen_until is None else max(self.seen_until, forgotten)
+        return True
+
+    def add(self, tokens: Sequence[str], weight: float, timestamp: float) -> None:
+        if not weight or not tokens:
+            return
+        store = self.likes if weight > 0 else self.dislikes
+        size = len(self.rates)
+        factors = []
+        for i, rate in enumerate(self.rates):
+            ref = self.refs[i]
+            if ref is None:
+                ref = self.refs[i] = timestamp
+            exponent = rate * (timestamp - ref)
+            if exponent > REBASE_AT:
+                self._rebase(i, timestamp)
+                exponent = 0.0
+            factors.append(abs(weight) * math.exp(exponent))
+        for token in tokens:
+            sums = store.get(token)
+            if sums is None:
+                sums = store[token] = [0.0] * size
+            for i in range(size):
+                sums[i] += factors[i]
+        self.events += 1
+        if self.latest is None or timestamp > self.latest:
+            self.latest = timestamp
+
+    def _rebase(self, i: int, ref: float) -> None:
+        scale = math.exp(-self.rates[i] * (ref - self.refs[i]))
+        for store in (self.likes, self.dislikes):
+            for sums in store.values():
+                sums[i] *= scale
+        self.refs[i] = ref
+
+    def add_movie(self, movie: Dict[str, Any], weight: float, timestamp: float) -> None:
+        self.add(_movie_tokens(movie), weight, timestamp)
+
+    def _value(self, sums: Optional[List[float]], i: int, now: float) -> float:
+        if not sums or self.refs[i] is None:
+            return 0.0
+        exponent = min(-self.rates[i] * (now - self.refs[i]), MAX_QUERY_EXP)
+        return sums[i] * math.exp(exponent)
+
+    def resolve_half_life(
+        self, half_life_days: Optional[float], approximate: bool = False
+    ) -> Optional[float]:
+        """The tracked half-life to query (None = no decay).
+
+        Only tracked half-lives can be answered exactly. Interpolating the like
+        and dislike sums separately can flip the sign of their difference, so an
+        untracked half-life raises ValueError unless `approximate` snaps it to
+        the nearest tracked one (in log scale).
+        """
+        if half_life_days is None or half_life_days <= 0 or math.isinf(half_life_days):
+            return None
+        for tracked in self.half_lives:
+            if math.isclose(half_life_days, tracked, rel_tol=1e-9):
+                return tracked
+        if not approximate:
+            tracked_list = ", ".join(f"{h:g}" for h in sorted(self.half_lives))
+            raise ValueError(
+                f"half-life {half_life_days:g} days is not tracked (tracked: {tracked_list}, "
+                "or 0 for no decay)"
+            )
+        return min(self.half_lives, key=lambda h: abs(math.log(h / half_life_days)))
+
+    def _rate_index(self, half_life_days: Optional[float]) -> int:
+        tracked = self.resolve_half_life(half_life_days)
+        return 0 if tracked is None else 1 + self.half_lives.index(tracked)
+
+    def delta_top(
+        self,
+        prefix: str,
+        n: int,
+        half_life_days: Optional[float] = None,
+        now: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        """Tokens with the largest decayed like-minus-dislike weight.
+
+        `half_life_days` must be tracked (see `resolve_half_life`). Costs one
+        pass over the distinct tokens, never over the history.
+        """
+        i = self._rate_index(half_life_days)
+        if now is None:
+            now = self.latest if self.latest is not None else time.time()
+        marker = f"{prefix}:"
+        deltas: List[Tuple[float, float, str]] = []
+        for token in set(self.likes) | set(self.dislikes):
+            if not token.startswith(marker):
+                continue
+            liked = self._value(self.likes.get(token), i, now)
+            disliked = self._value(self.dislikes.get(token), i, now)
+            deltas.append((liked - disliked, liked, token[len(marker):]))
+        deltas.sort(reverse=True)
+        return [
+            {"key": key, "weight": round(delta, 4)}
+            for delta, _, key in deltas[:n]
+            if abs(delta) >= 1e-4
+        ]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "version": 1,
+            "half_lives_days": self.half_lives,
+            "refs": self.refs,
+            "events": self.events,
+            "latest": self.latest,
+            "likes": self.likes,
+            "dislikes": self.dislikes,
+            "seen": self.seen,
+            "seen_until": self.seen_until,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SignalEngine":
+        engine = cls(data.get("half_lives_days", DEFAULT_HALF_LIVES))
+        refs = list(data.get("refs", []))
+        if len(refs) != len(engine.rates):
+            raise ValueError("State does not match its half-life ladder; rebuild it from the history.")
+        engine.refs = refs
+        engine.events = int(data.get("events", 0))
+        engine.latest = data.get("latest")
+        engine.likes = {k: list(v) for k, v in data.get("likes", {}).items()}
+        engine.dislikes = {k: list(v) for k, v in data.get("dislikes", {}).items()}
+        engine.seen = dict(data.get("seen", {}))
+        engine.seen_until = data.get("seen_until")
+        return engine
+
+
+def _rated_movies(data: Dict[str, Any]) -> List[Tuple[Dict[str, Any], Optional[float]]]:
+    """(movie, weight) pairs: ratings win; otherwise likes are +1 and dislikes -1."""
+    out: List[Tuple[Dict[str, Any], Optional[float]]] = []
+    for field, default in [("likes", 1.0), ("dislikes", -1.0), ("ratings", None)]:
+        for movie in _normalize_movies(data.get(field)):
+            weight = rating_weight(movie.get("rating"))
+            out.append((movie, default if weight is None else weight))
+    return out
+
+
+def _rating_key(movie: Dict[str, Any], timestamp: Optional[float]) -> Optional[str]:
+    """Identity of one rating: the movie (slug, else title) and when it was rated"""
+    movie_key = _norm_token(movie.get("slug")) or _norm_token(movie.get("title"))
+    if movie_key is None:
+        return None
+    return movie_key if timestamp is None else f"{movie_key}@{timestamp!r}"
+
+
+def ingest(
+    engine: SignalEngine, data: Dict[str, Any], default_time: Optional[float] = None
+) -> Tuple[int, int]:
+    """Add every rated movie not ingested before; returns (added, skipped).
+
+    Undated movies are stamped with the newest time seen. Ratings already in
+    the engine (same movie and time) are skipped, so re-running with the full
+    history or retrying after a failure does not count them twice.
+    """
+    movies = _rated_movies(data)
+    times = [_movie_time(m) for m, _ in movies]
+    dated = [t for t in times if t is not None]
+    fallback = default_time
+    if fallback is None:
+        fallback = max(dated) if dated else (engine.latest or time.time())
+    before = engine.events
+    skipped = 0
+    for (movie, weight), ts in zip(movies, times):
+        if not weight:
+            continue
+        timestamp = fallback if ts is None else ts
+        key = _rating_key(movie, ts)
+        if key is not None and not engine.mark_seen(key, timestamp, dated=ts is not None):
+            skipped += 1
+            continue
+        engine.add_movie(movie, weight, timestamp)
+    return engine.events - before, skipped
+
+
+def _write_state(path: str, engine: SignalEngine) -> None:
+    """Write the state atomically, so an interrupted run keeps the previous one"""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(engine.to_dict(), f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Time-decayed, rating-weighted taste signals with incremental updates."
+    )
+    parser.add_argument("--input", help="New ratings JSON: {likes, dislikes, ratings} (use '-' for stdin).")
+    parser.add_argument("--state", help="Engine state JSON; loaded if present and saved after ingesting.")
+    parser.add_argument("--output", required=True, help="Path to output JSON (use '-' for stdout).")
+    parser.add_argument(
+        "--half-life",
+        type=float,
+        default=90.0,
+        help="Half-life in days for the query (0 = no decay); must be on the ladder.",
+    )
+    parser.add_argument(
+        "--approximate",
+        action="store_true",
+        help="Snap a --half-life that is not on the ladder to the nearest tracked one.",
+    )
+    parser.add_argument(
+        "--ladder",
+        type=float,
+        nargs="+",
+        default=DEFAULT_HALF_LIVES,
+        help="Half-lives (days) to track when creating new state.",
+    )
+    parser.add_argument("--now", help="Query time (ISO 8601 or epoch seconds); default: newest rating.")
+    parser.add_argument("--top", type=int, default=10, help="How many items per list.")
+    args = parser.parse_args()
+
+    if not (args.input or args.state):
+        parser.error("provide --input and/or --state")
+
+    engine: Optional[SignalEngine] = None
+    if args.state:
+        try:
+            engine = SignalEngine.from_dict(_read_json(args.state))
+        except FileNotFoundError:
+            engine = None
+        except ValueError as exc:
+            parser.error(
+                f"cannot load --state {args.state} ({exc}); delete it and re-run with the full history"
+            )
+    if engine is None:
+        engine = SignalEngine(args.ladder)
+
+    added = skipped = 0
+    started = time.perf_counter()
+    if args.input:
+        added, skipped = ingest(engine, _read_json(args.input))
+        if args.state:
+            _write_state(args.state, engine)
+    ingested = time.perf_counter()
+
+    now = parse_timestamp(args.now) if args.now else None
+    if args.now and now is None:
+        parser.error(f"could not parse --now {args.now!r}")
+    requested = args.half_life or None
+    try:
+        half_life = engine.resolve_half_life(requested, approximate=args.approximate)
+    except ValueError as exc:
+        parser.error(f"{exc}; pass --approximate to use the nearest")
+    signals = {
+        label: {"delta_top": engine.delta_top(prefix, args.top, half_life, now)}
+        for label, prefix in FIELDS.items()
+    }
+    queried = time.perf_counter()
+
+    output = {
+        "query": {
+            "half_life_days": requested,
+            "half_life_days_used": half_life,
+            "tracked_half_lives_days": engine.half_lives,
+            "now": now if now is not None else engine.latest,
+        },
+        "signals": signals,
+        "stats": {
+            "events": engine.events,
+            "added": added,
+            "skipped_duplicates": skipped,
+            "tokens": len(set(engine.likes) | set(engine.dislikes)),
+            "ingest_ms": round((ingested - started) * 1000, 2),
+            "query_ms": round((queried - ingested) * 1000, 2),
+        },
+        "notes": (
+            "weight is the decayed sum of rating weights ((rating - 5.5) / 4.5; likes +1, dislikes -1 "
+            "when unrated) for likes minus dislikes, at half_life_days_used."
+        ),
+    }
+    _write_json(args.output, output)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
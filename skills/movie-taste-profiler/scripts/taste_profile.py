@@ -5,6 +5,7 @@ import json
 import sys
 from collections import Counter
 from dataclasses import dataclass
+from itertools import combinations
 from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 
@@ -119,6 +120,155 @@ def _delta_top(likes: Counter, dislikes: Counter, n: int) -> List[ItemCount]:
     return [ItemCount(key=k, count=d) for k, d in deltas[:n] if d != 0]
 
 
+COMBO_FIELDS = [
+    ("genres", "genre"),
+    ("directors", "director"),
+    ("tags", "tag"),
+]
+# Tokens per movie that enter combination mining: C(12, 3) = 220 triples at most.
+DEFAULT_MAX_COMBO_TOKENS = 12
+
+
+def _movie_tokens(movie: Dict[str, Any]) -> List[str]:
+    tokens = set()
+    for field, prefix in COMBO_FIELDS:
+        for raw in _as_list(movie.get(field)):
+            token = _norm_token(raw)
+            if token:
+                tokens.add(f"{prefix}:{token}")
+    decade = _decade(movie.get("year"))
+    if decade:
+        tokens.add(f"era:{decade}")
+    return sorted(tokens)
+
+
+def _count_combos(
+    token_sets: List[List[str]],
+    size: int,
+    frequent: Optional[set] = None,
+) -> Counter:
+    """Sparse co-occurrence counts: one Counter entry per combination seen.
+
+    Cost is the sum over movies of C(tokens, size), so it grows linearly with
+    history length as long as tokens per movie are capped (see
+    `_discriminating_combos`). When `frequent` holds the frequent (size - 1)-combinations,
+    candidates with an infrequent subset are skipped (apriori pruning).
+    """
+    c: Counter = Counter()
+    for tokens in token_sets:
+        for combo in combinations(tokens, size):
+            if frequent is not None and size > 2:
+                if any(sub not in frequent for sub in combinations(combo, size - 1)):
+                    continue
+            c[combo] += 1
+    return c
+
+
+def _like_rate(likes: int, dislikes: int) -> float:
+    return likes / (likes + dislikes)
+
+
+def _discriminating_combos(
+    like_sets: List[List[str]],
+    dislike_sets: List[List[str]],
+    *,
+    min_support: int,
+    triples: bool,
+    n: int,
+    max_tokens: int = DEFAULT_MAX_COMBO_TOKENS,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Token combinations whose like rate differs from that of their parts.
+
+    A pair only made of tokens that are already liked (or disliked) on their own
+    adds nothing; the interesting ones are "sci-fi, but only from the 2010s".
+    `lift` is measured against the part whose verdict the combination flips:
+    the least-liked part for a liked combination, the most-liked part for a
+    disliked one. If that part already leans the combination's way (like rate
+    on the same side of 0.5), nothing is flipped and the combination is skipped.
+
+    Each movie contributes at most `max_tokens` tokens, its most frequent ones
+    across the history, so tag-heavy movies cannot blow up C(k, 3).
+    """
+    like_tokens = _count_combos(like_sets, 1)
+    dislike_tokens = _count_combos(dislike_sets, 1)
+    frequent = {
+        t for t in set(like_tokens) | set(dislike_tokens)
+        if like_tokens[t] + dislike_tokens[t] >= min_support
+    }
+    def _mined(tokens: List[str]) -> List[str]:
+        kept = [t for t in tokens if (t,) in frequent]
+        if len(kept) > max_tokens:
+            by_support = sorted(kept, key=lambda t: (-(like_tokens[(t,)] + dislike_tokens[(t,)]), t))
+            # Combinations are counted as sorted tuples, so restore token order
+            kept = sorted(by_support[:max_tokens])
+        return kept
+
+    like_sets = [_mined(s) for s in like_sets]
+    dislike_sets = [_mined(s) for s in dislike_sets]
+
+    counts = {1: (like_tokens, dislike_tokens)}
+    sizes = [2, 3] if triples else [2]
+    out: Dict[str, List[Dict[str, Any]]] = {}
+    for size in sizes:
+        like_c = _count_combos(like_sets, size, frequent)
+        dislike_c = _count_combos(dislike_sets, size, frequent)
+        support = {
+            k: like_c[k] + dislike_c[k] for k in set(like_c) | set(dislike_c)
+        }
+        frequent = {k for k, v in support.items() if v >= min_support}
+        counts[size] = (like_c, dislike_c)
+
+        entries: List[Tuple[float, int, Dict[str, Any]]] = []
+        for combo in frequent:
+            liked, disliked = like_c[combo], dislike_c[combo]
+            delta = liked - disliked
+            if delta == 0:
+                continue
+            rate = _like_rate(liked, disliked)
+            sub_l, sub_d = counts[size - 1]
+            part_rates = [
+                _like_rate(sub_l[sub], sub_d[sub])
+                for sub in combinations(combo, size - 1)
+            ]
+            flipped = min(part_rates) if delta > 0 else max(part_rates)
+            if (delta > 0 and flipped >= 0.5) or (delta < 0 and flipped <= 0.5):
+                continue  # Every part already leans this way: no verdict flips
+            lift = rate - flipped
+            # Lead with the token that needs the others to flip its usual verdict.
+            single_l, single_d = counts[1]
+            tokens = sorted(
+                combo,
+                key=lambda t: _like_rate(single_l[(t,)], single_d[(t,)]),
+                reverse=delta < 0,
+            )
+            entries.append((abs(lift) * (liked + disliked), abs(delta), {
+                "tokens": tokens,
+                "likes": liked,
+                "dislikes": disliked,
+                "delta": delta,
+                "lift": round(lift, 3),
+            }))
+        entries.sort(key=lambda e: (e[0], e[1], e[2]["tokens"]), reverse=True)
+        out["pairs" if size == 2 else "triples"] = [e[2] for e in entries[:n]]
+    return out
+
+
+def _token_label(token: str) -> str:
+    prefix, _, key = token.partition(":")
+    return f"{prefix}: {key}"
+
+
+def _depends_on_lines(combos: Dict[str, Any], n: int = 3) -> List[str]:
+    entries = list(combos.get("triples", [])) + list(combos.get("pairs", []))
+    entries.sort(key=lambda e: abs(e.get("lift", 0)) * (e["likes"] + e["dislikes"]), reverse=True)
+    lines: List[str] = []
+    for e in entries[:n]:
+        base, *conditions = [_token_label(t) for t in e["tokens"]]
+        verb = "works" if e["delta"] > 0 else "is avoided"
+        lines.append(f"{base} {verb} with {' + '.join(conditions)} ({e['delta']:+d})")
+    return lines
+
+
 def _suggest_questions(summary: Dict[str, Any]) -> List[str]:
     questions: List[str] = []
     if not summary.get("has_notes"):
@@ -164,13 +314,17 @@ def _collect_preference_card(signals: Dict[str, Any]) -> Dict[str, List[str]]:
     if not usually_avoid:
         usually_avoid = ["Insufficient structured metadata to extract stable avoids yet."]
 
+    depends_on = _depends_on_lines(signals.get("combinations", {}))
+    if not depends_on:
+        depends_on = [
+            "Pacing and tone match can override genre preferences.",
+            "Strong characters can make borderline genres work.",
+        ]
+
     return {
         "usually_like": usually_like,
         "usually_avoid": usually_avoid,
-        "depends_on": [
-            "Pacing and tone match can override genre preferences.",
-            "Strong characters can make borderline genres work.",
-        ],
+        "depends_on": depends_on,
     }
 
 
@@ -189,6 +343,23 @@ def main() -> int:
         help="Path to output JSON (use '-' for stdout).",
     )
     parser.add_argument("--top", type=int, default=10, help="How many items per list.")
+    parser.add_argument(
+        "--min-support",
+        type=int,
+        default=2,
+        help="Minimum likes + dislikes for a token combination to be reported.",
+    )
+    parser.add_argument(
+        "--triples",
+        action="store_true",
+        help="Also mine three-token combinations (pruned from frequent pairs).",
+    )
+    parser.add_argument(
+        "--max-combo-tokens",
+        type=int,
+        default=DEFAULT_MAX_COMBO_TOKENS,
+        help="Most frequent tokens per movie considered for combinations (bounds the cost).",
+    )
     args = parser.parse_args()
 
     data = _read_json(args.input)
@@ -241,6 +412,15 @@ def main() -> int:
             "delta_top": [ic.__dict__ for ic in _delta_top(like_c, dislike_c, args.top)],
         }
 
+    signals["combinations"] = _discriminating_combos(
+        [_movie_tokens(m) for m in likes],
+        [_movie_tokens(m) for m in dislikes],
+        min_support=max(1, args.min_support),
+        triples=args.triples,
+        n=args.top,
+        max_tokens=max(2, args.max_combo_tokens),
+    )
+
     output = {
         "summary": summary,
         "signals": signals,
@@ -255,7 +435,8 @@ def main() -> int:
             ),
             "notes": (
                 "delta_top is likes_count minus dislikes_count for each token; "
-                "use it to spot discriminating signals, not as a definitive model."
+                "use it to spot discriminating signals, not as a definitive model. "
+                "combinations lists token pairs/triples whose like rate differs from their parts (lift)."
             ),
         },
     }